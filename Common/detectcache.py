@@ -0,0 +1,103 @@
+"""
+detectcache.py — Persistent cache for YOLO region detections.
+
+``newPredict.py`` is often re-run on the same sheets after changing only
+counting parameters (``DEDUP_THRESHOLD``, assembly …), and every run used
+to render and detect each page again.  The detector output of a page — or
+of one tile in tiled mode — is stored once, keyed by
+
+    sha256(PDF) + page number + render zoom (+ tile clip) + sha256(model weights)
+
+as a small JSON record (raw boxes in pixels, the same boxes in page
+points, render geometry) plus the annotated image as PNG when there are
+boxes.  A hit skips both the render and the inference.  As for
+``wordcache`` the directory is size-bounded with least-recently-used
+eviction (``lrucache.CacheDir``).
+
+Configuration (environment):
+  PDFIT2_DETECT_CACHE      cache directory, or "off" to disable
+                           (default: ~/.cache/pdfit2/detections)
+  PDFIT2_DETECT_CACHE_MB   size limit in MiB (default: 1024)
+
+Usage
+-----
+    from detectcache import default_cache, detection_key, weights_id
+    cache = default_cache()
+    key = detection_key(page_number, zoom, clip, weights_id(yolo))
+    hit = cache.load(file_hash(pdf), key)          # (record, annotated png) or None
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+from PIL import Image
+
+from lrucache import CacheDir
+from wordcache import file_hash
+
+# attributes a detector may keep its weights file in, most specific first
+# (cpubackend sets onnx_path for the exported model; yolo.YOLO has model_path)
+WEIGHT_ATTRS = ("onnx_path", "model_path", "weights", "weights_path")
+
+
+def weights_id(detector) -> Optional[str]:
+    """sha256 of the detector's weights file, or None when it cannot be found."""
+    for attr in WEIGHT_ATTRS:
+        path = getattr(detector, attr, None)
+        if isinstance(path, (str, os.PathLike)) and os.path.isfile(path):
+            return file_hash(path)
+    return None
+
+
+def detection_key(page_number: int, zoom: float, clip: Optional[Sequence[float]], weights: str) -> str:
+    """Entry name for one detector call: page, zoom, tile clip and weights."""
+    spec = f"{zoom:.6g}|" + ("page" if clip is None else ",".join(f"{v:.3f}" for v in clip))
+    return f"p{page_number}_{hashlib.sha256(f'{spec}|{weights}'.encode()).hexdigest()[:24]}"
+
+
+class DetectionCache(CacheDir):
+    """LRU-bounded directory of detection records (``.json``) and annotated images (``.png``)."""
+
+    SUFFIXES = (".json", ".png")
+    ENV = "PDFIT2_DETECT_CACHE"
+    DEFAULT_DIR = Path.home() / ".cache" / "pdfit2" / "detections"
+    DEFAULT_MB = 1024
+
+    def _entry(self, digest: str, key: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}_{key}.json"
+
+    def load(self, digest: str, key: str) -> Optional[Tuple[Dict, Optional[Path]]]:
+        """``(record, annotated PNG or None)``, or None on a miss."""
+        path = self._entry(digest, key)
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        image = path.with_suffix(".png")
+        if record.get("boxes") and not image.is_file():
+            return None                                    # image evicted: treat as a miss
+        self.touch(*((path, image) if record.get("boxes") else (path,)))
+        return record, image if record.get("boxes") else None
+
+    def store(self, digest: str, key: str, record: Dict,
+              annotated: Union[Image.Image, os.PathLike, str, None] = None) -> None:
+        """Store ``record``; ``annotated`` is a PIL image or an already written PNG file."""
+        path = self._entry(digest, key)
+        if isinstance(annotated, Image.Image):
+            self.write(path.with_suffix(".png"), lambda fh: annotated.save(fh, format="PNG"))
+        elif annotated is not None:
+            def copy(fh):
+                with open(annotated, "rb") as src:
+                    shutil.copyfileobj(src, fh)
+            self.write(path.with_suffix(".png"), copy)
+        self.write(path, lambda fh: fh.write(json.dumps(record).encode("utf-8")))
+
+
+def default_cache() -> Optional[DetectionCache]:
+    """Cache configured by the environment, or None when disabled."""
+    return DetectionCache.from_env()
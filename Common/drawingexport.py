@@ -0,0 +1,347 @@
+"""
+drawingexport.py — Vector layer straight from ``page.get_drawings()``.
+
+The SVG route (``page.get_svg_image`` + ``svgstream``) makes MuPDF write
+every glyph and base64-encode every image only for the filter to throw
+them away, and each of the tens of thousands of CAD strokes becomes its
+own ``<path>`` with the full set of style attributes.  Here the page's
+drawings are walked once and collected into style groups — stroke colour,
+width, fill, opacity, fill rule, cap/join and dashes — so a sheet with
+40 000 lines in a dozen styles becomes a few dozen groups:
+
+* ``write_svg`` — compact SVG: one ``<g>`` with the style per group; the
+  sub-paths of an opaque stroke-only group are merged into a single
+  ``<path>``, otherwise each drawing keeps its own ``<path>`` inside the
+  group (merged fills could cut holes where sub-paths of opposite winding
+  overlap).  Redundant moves and repeated command letters are left out.
+* ``write_bin`` — binary path file (format below), read back by
+  ``read_bin``.
+
+Coordinates are in the (rotated) page space of ``page.rect``, like
+``get_svg_image``.  ``quantum`` snaps them to a grid in points (e.g. 0.1);
+without it they are kept to 0.001 pt.  Paint order is kept where it is
+visible: a fill closes the groups opened before it, so drawings after it
+go into new groups painted above it; between strokes of different styles
+the order is not kept.  Clip paths are not applied (``get_drawings`` does
+not report them), so strokes hidden by a clip in the PDF are drawn.
+
+Binary format (little-endian; coordinates are float32, or int32 grid
+units when quantised — multiply by ``quantum``)::
+
+    "PDFV" u16 version u16 flags(1 = quantised) f32 width f32 height
+    f64 quantum u32 groups
+    per group:
+      u8 has_stroke 3×u8 stroke rgb  u8 has_fill 3×u8 fill rgb
+      f32 width f32 stroke_opacity f32 fill_opacity
+      u8 even_odd u8 line_cap u8 line_join u8 n_dash n_dash×f32 dashes f32 dash_phase
+      u32 n_ops n_ops×u8 ops   u32 n_coords n_coords×(f32|i32)
+    ops: 0 M (2 coords), 1 L (2), 2 C (6), 3 Z, 4 end of one drawing
+
+Usage
+-----
+    from drawingexport import collect_groups, write_svg, write_bin
+    groups = collect_groups(page, quantum=0.1)
+    write_svg(groups, page.rect, "page0000.svg")
+    write_bin(groups, page.rect, "page0000.pdfv", quantum=0.1)
+"""
+from __future__ import annotations
+
+import os
+import re
+import struct
+from array import array
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+MAGIC = b"PDFV"
+VERSION = 1
+OP_M, OP_L, OP_C, OP_Z, OP_END = range(5)
+_OP_ARGS = {OP_M: 2, OP_L: 2, OP_C: 6, OP_Z: 0, OP_END: 0}
+_OP_SVG = {OP_M: "M", OP_L: "L", OP_C: "C", OP_Z: "Z"}
+_CAPS = ("butt", "round", "square")
+_JOINS = ("miter", "round", "bevel")
+_DASHES = re.compile(r"\[([^\]]*)\]\s*([-\d.]*)")
+
+
+class Style(NamedTuple):
+    stroke: Optional[Tuple[int, int, int]]   # 0-255 rgb, None = not stroked
+    fill: Optional[Tuple[int, int, int]]
+    width: float
+    stroke_opacity: float
+    fill_opacity: float
+    even_odd: bool
+    line_cap: int
+    line_join: int
+    dashes: Tuple[float, ...]
+    dash_phase: float
+
+    def mergeable(self) -> bool:
+        """Whether the drawings of this style can share one path without changing the result."""
+        return self.fill is None and self.stroke_opacity >= 1
+
+
+class Group:
+    """Drawings of one style: op codes and their coordinates, drawings separated by ``OP_END``."""
+
+    def __init__(self, style: Style):
+        self.style = style
+        self.ops = bytearray()
+        self.coords = array("d")
+        self.drawings = 0
+
+
+def _rgb(color) -> Optional[Tuple[int, int, int]]:
+    if color is None:
+        return None
+    if len(color) == 1:
+        color = color * 3
+    elif len(color) == 4:                      # CMYK, naive conversion
+        c, m, y, k = color
+        color = ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    return tuple(min(255, max(0, round(v * 255))) for v in color[:3])
+
+
+def _dashes(spec: Optional[str]) -> Tuple[Tuple[float, ...], float]:
+    m = _DASHES.match(spec or "")
+    if not m or not m.group(1).strip():
+        return (), 0.0
+    return tuple(float(v) for v in m.group(1).split()), float(m.group(2) or 0)
+
+
+def _opacity(value: Optional[float]) -> float:
+    return 1.0 if value is None else round(value, 3)
+
+
+def _style(d: Dict) -> Optional[Style]:
+    kind = d.get("type", "")
+    stroke = _rgb(d.get("color")) if "s" in kind else None
+    fill = _rgb(d.get("fill")) if "f" in kind else None
+    stroke_opacity = _opacity(d.get("stroke_opacity"))
+    fill_opacity = _opacity(d.get("fill_opacity"))
+    if stroke_opacity <= 0:                    # fully transparent paint is not exported
+        stroke = None
+    if fill_opacity <= 0:
+        fill = None
+    if stroke is None and fill is None:
+        return None                            # clip / group entries, invisible paths
+    cap = d.get("lineCap") or 0
+    if isinstance(cap, (tuple, list)):
+        cap = cap[0]
+    dashes, phase = _dashes(d.get("dashes")) if stroke else ((), 0.0)
+    return Style(stroke, fill,
+                 round(d.get("width") or 0, 3) if stroke else 0.0,
+                 stroke_opacity if stroke else 1.0,
+                 fill_opacity if fill else 1.0,
+                 bool(d.get("even_odd")) if fill else False,
+                 int(cap or 0), int(d.get("lineJoin") or 0), dashes, phase)
+
+
+_STYLE_KEYS = ("type", "color", "fill", "width", "stroke_opacity", "fill_opacity",
+               "even_odd", "lineCap", "lineJoin", "dashes")
+
+
+def collect_groups(page: fitz.Page, quantum: Optional[float] = None) -> List[Group]:
+    """Walk the page's drawings once and bucket the paths by style, in first-seen order."""
+    a, b, c, d_, e, f = page.rotation_matrix if page.rotation else (1, 0, 0, 1, 0, 0)
+    step = quantum or 0.001                         # grid in points; points are compared on it
+    scale = 1 / step
+
+    def q(p) -> Tuple[int, int]:
+        x, y = p[0], p[1]
+        return round((x * a + y * c + e) * scale), round((x * b + y * d_ + f) * scale)
+
+    # get_cdrawings returns plain tuples instead of Point/Rect objects (much
+    # cheaper for 40 000 strokes); older PyMuPDF only has get_drawings
+    drawings = page.get_cdrawings() if hasattr(page, "get_cdrawings") else page.get_drawings()
+    styles: Dict[Tuple, Optional[Style]] = {}
+    groups: List[Group] = []
+    open_groups: Dict[Style, Group] = {}
+    last: Optional[Style] = None
+    for dr in drawings:
+        key = tuple(dr.get(k) for k in _STYLE_KEYS)
+        if key not in styles:
+            styles[key] = _style(dr)
+        style = styles[key]
+        if style is None:
+            continue
+        if style.fill is not None and style != last:
+            # a fill may cover what was painted before it: later drawings must
+            # not be merged into groups written underneath it
+            open_groups.clear()
+        last = style
+        g = open_groups.get(style)
+        if g is None:
+            g = open_groups[style] = Group(style)
+            groups.append(g)
+        ops, coords = g.ops, g.coords
+        cur = None
+        for item in dr["items"]:
+            op = item[0]
+            if op == "l" or op == "c":
+                pt = q(item[1])
+                if pt != cur:
+                    ops.append(OP_M)
+                    coords.extend(pt)
+                if op == "l":
+                    cur = q(item[2])
+                    ops.append(OP_L)
+                    coords.extend(cur)
+                else:
+                    ops.append(OP_C)
+                    for p in item[2:5]:
+                        cur = q(p)
+                        coords.extend(cur)
+            elif op == "re" or op == "qu":
+                if op == "re":
+                    x0, y0, x1, y1 = item[1]
+                    corners = ((x0, y0), (x1, y0), (x1, y1), (x0, y1))
+                else:
+                    ul, ur, ll, lr = item[1]
+                    corners = (ul, ur, lr, ll)
+                cur = q(corners[0])
+                ops.append(OP_M)
+                coords.extend(cur)
+                for p in corners[1:]:
+                    ops.append(OP_L)
+                    coords.extend(q(p))
+                ops.append(OP_Z)
+        if dr.get("closePath") and cur is not None and ops[-1] != OP_Z:
+            ops.append(OP_Z)
+        ops.append(OP_END)
+        g.drawings += 1
+
+    for g in groups:                                # grid units → points
+        g.coords = array("d", (v * step for v in g.coords))
+    return groups
+
+
+# ---------------------------------------------------------------------------
+# SVG
+# ---------------------------------------------------------------------------
+
+def _num(v: float, decimals: int) -> str:
+    s = f"{v:.{decimals}f}".rstrip("0").rstrip(".")
+    return "0" if s in ("", "-0") else s
+
+
+def _style_attrs(s: Style) -> str:
+    attrs = [f'fill="#{s.fill[0]:02x}{s.fill[1]:02x}{s.fill[2]:02x}"' if s.fill else 'fill="none"']
+    if s.fill and s.fill_opacity < 1:
+        attrs.append(f'fill-opacity="{s.fill_opacity:g}"')
+    if s.fill and s.even_odd:
+        attrs.append('fill-rule="evenodd"')
+    if s.stroke:
+        attrs.append(f'stroke="#{s.stroke[0]:02x}{s.stroke[1]:02x}{s.stroke[2]:02x}" '
+                     f'stroke-width="{s.width:g}"')
+        if s.stroke_opacity < 1:
+            attrs.append(f'stroke-opacity="{s.stroke_opacity:g}"')
+        if s.line_cap:
+            attrs.append(f'stroke-linecap="{_CAPS[s.line_cap % 3]}"')
+        if s.line_join:
+            attrs.append(f'stroke-linejoin="{_JOINS[s.line_join % 3]}"')
+        if s.dashes:
+            attrs.append(f'stroke-dasharray="{",".join(f"{v:g}" for v in s.dashes)}"')
+            if s.dash_phase:
+                attrs.append(f'stroke-dashoffset="{s.dash_phase:g}"')
+    return " ".join(attrs)
+
+
+def _path_data(g: Group, decimals: int) -> List[str]:
+    """One ``d`` string per drawing; command letters are only written when they change."""
+    paths: List[str] = []
+    parts: List[str] = []
+    last = None
+    k = 0
+    for op in g.ops:
+        if op == OP_END:
+            paths.append("".join(parts))
+            parts.clear()
+            last = None
+            continue
+        if op != last or op == OP_M:
+            parts.append(_OP_SVG[op])
+        elif parts:
+            parts.append(" ")
+        n = _OP_ARGS[op]
+        parts.append(" ".join(_num(v, decimals) for v in g.coords[k:k + n]))
+        k += n
+        last = op
+    return paths
+
+
+def write_svg(groups: List[Group], rect: fitz.Rect, path: os.PathLike | str,
+              quantum: Optional[float] = None) -> None:
+    decimals = min(6, max(0, -Decimal(str(quantum)).normalize().as_tuple().exponent)) if quantum else 3
+    with open(path, "w", encoding="utf-8") as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                  f'<svg xmlns="http://www.w3.org/2000/svg" width="{rect.width:g}" '
+                  f'height="{rect.height:g}" viewBox="0 0 {rect.width:g} {rect.height:g}">')
+        for g in groups:
+            paths = _path_data(g, decimals)
+            out.write(f"<g {_style_attrs(g.style)}>")
+            if g.style.mergeable():
+                out.write(f'<path d="{"".join(paths)}"/>')
+            else:
+                out.writelines(f'<path d="{d}"/>' for d in paths)
+            out.write("</g>")
+        out.write("</svg>\n")
+
+
+# ---------------------------------------------------------------------------
+# Binary
+# ---------------------------------------------------------------------------
+_HEADER = struct.Struct("<4sHHffdI")
+_STYLE = struct.Struct("<B3BB3BfffBBBB")
+
+
+def write_bin(groups: List[Group], rect: fitz.Rect, path: os.PathLike | str,
+              quantum: Optional[float] = None) -> None:
+    with open(path, "wb") as out:
+        out.write(_HEADER.pack(MAGIC, VERSION, 1 if quantum else 0, rect.width, rect.height,
+                               quantum or 0.0, len(groups)))
+        for g in groups:
+            s = g.style
+            out.write(_STYLE.pack(s.stroke is not None, *(s.stroke or (0, 0, 0)),
+                                  s.fill is not None, *(s.fill or (0, 0, 0)),
+                                  s.width, s.stroke_opacity, s.fill_opacity,
+                                  s.even_odd, s.line_cap, s.line_join, len(s.dashes)))
+            out.write(struct.pack(f"<{len(s.dashes)}ff", *s.dashes, s.dash_phase))
+            out.write(struct.pack("<I", len(g.ops)) + bytes(g.ops))
+            if quantum:
+                coords = array("i", (round(v / quantum) for v in g.coords))
+            else:
+                coords = array("f", g.coords)
+            out.write(struct.pack("<I", len(coords)) + coords.tobytes())
+
+
+def read_bin(path: os.PathLike | str) -> Tuple[Tuple[float, float], List[Group]]:
+    """``((width, height), groups)`` of a file written by ``write_bin``; coordinates in points."""
+    with open(path, "rb") as fh:
+        data = fh.read()
+    magic, version, flags, width, height, quantum, count = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not a version {VERSION} vector file")
+    pos = _HEADER.size
+    groups: List[Group] = []
+    for _ in range(count):
+        (has_stroke, sr, sg, sb, has_fill, fr, fg, fb, width_, s_op, f_op,
+         even_odd, cap, join, n_dash) = _STYLE.unpack_from(data, pos)
+        pos += _STYLE.size
+        *dashes, phase = struct.unpack_from(f"<{n_dash}ff", data, pos)
+        pos += 4 * (n_dash + 1)
+        g = Group(Style((sr, sg, sb) if has_stroke else None, (fr, fg, fb) if has_fill else None,
+                        round(width_, 3), round(s_op, 3), round(f_op, 3), bool(even_odd),
+                        cap, join, tuple(dashes), phase))
+        (n_ops,) = struct.unpack_from("<I", data, pos)
+        g.ops = bytearray(data[pos + 4:pos + 4 + n_ops])
+        pos += 4 + n_ops
+        (n_coords,) = struct.unpack_from("<I", data, pos)
+        raw = array("i" if flags & 1 else "f")
+        raw.frombytes(data[pos + 4:pos + 4 + 4 * n_coords])
+        pos += 4 + 4 * n_coords
+        g.coords = array("d", (v * quantum for v in raw)) if flags & 1 else array("d", raw)
+        g.drawings = g.ops.count(OP_END)
+        groups.append(g)
+    return (width, height), groups
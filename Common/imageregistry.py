@@ -0,0 +1,111 @@
+"""
+imageregistry.py — Extract each image of a document once.
+
+Title-block logos, stamps and north arrows are the same image object on
+every sheet, so extracting per ``(page, image)`` pair decodes and writes
+them hundreds of times.  ``ImageRegistry`` keeps a document-wide table:
+
+* by xref — the same image object referenced from another page is a hit
+  without touching the stream;
+* by content — a new xref is hashed over its image dictionary (without
+  ``/Length``) and raw (still encoded) stream, together with every object
+  the dictionary refers to: the colour space with its palette or ICC
+  profile, ``/SMask``, ``/Mask``, ``/DecodeParms``…  Identical images
+  stored under different xrefs are written once; the same samples under a
+  different palette or ``/Decode`` array are not merged.  Nothing is
+  decoded for the check.
+
+Only misses call the ``save`` callback; every page still records which
+files it shows, and ``write_manifest`` stores that mapping as JSON:
+
+    {"images": {file: {"xref", "sha256", "width", "height", "pages"}},
+     "pages":  {page: [file, ...]}}
+
+Usage
+-----
+    from imageregistry import ImageRegistry
+    registry = ImageRegistry(doc)
+    for n, img in enumerate(page.get_images(full=True)):
+        registry.add(page_no, img, lambda: write_file(img, n))   # save() returns the file name
+    registry.write_manifest(out_dir / "manifest.json")
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+from typing import Callable, Dict, List, Sequence, Set
+
+import fitz  # PyMuPDF
+
+MANIFEST_NAME = "manifest.json"
+_REF = re.compile(r"(\d+) \d+ R\b")
+_LENGTH = re.compile(r"/Length\s+\d+(?:\s+\d+\s+R\b)?")
+
+
+class ImageRegistry:
+    """Unique images of one document: xref → file and content hash → file."""
+
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self._by_xref: Dict[int, str] = {}
+        self._by_hash: Dict[str, str] = {}
+        self.images: Dict[str, Dict] = {}
+        self.pages: Dict[int, List[str]] = {}
+        self.reused = 0
+
+    def content_hash(self, img: Sequence) -> str:
+        """sha256 over the image object and everything it refers to (see module docstring)."""
+        h = hashlib.sha256()
+        self._hash_object(h, img[0], set())
+        return h.hexdigest()
+
+    def _hash_object(self, h, xref: int, seen: Set[int]) -> None:
+        # object numbers are replaced by the referenced objects' contents, so
+        # equal images whose palettes / masks are separate but equal objects match
+        if xref in seen:
+            h.update(b"|cycle|")
+            return
+        seen.add(xref)
+        text = _LENGTH.sub("", self.doc.xref_object(xref, compressed=True))
+        h.update(_REF.sub("R", text).encode())
+        if self.doc.xref_is_stream(xref):
+            h.update(b"|stream|")
+            h.update(self.doc.xref_stream_raw(xref) or b"")
+        for ref in _REF.findall(text):
+            h.update(b"|ref|")
+            self._hash_object(h, int(ref), seen)
+
+    def add(self, page: int, img: Sequence, save: Callable[[], str]) -> str:
+        """File name of image ``img`` (an entry of ``page.get_images(full=True)``) shown on ``page``.
+
+        ``save`` writes the image and returns its file name; it is only
+        called for an image that has not been seen in this document.
+        """
+        xref = img[0]
+        name = self._by_xref.get(xref)
+        if name is None:
+            digest = self.content_hash(img)
+            name = self._by_hash.get(digest)
+            if name is None:
+                name = save()
+                self._by_hash[digest] = name
+                self.images[name] = {"xref": xref, "sha256": digest, "width": img[2],
+                                     "height": img[3], "pages": []}
+            else:
+                self.reused += 1
+            self._by_xref[xref] = name
+        else:
+            self.reused += 1
+
+        info = self.images[name]
+        if not info["pages"] or info["pages"][-1] != page:
+            info["pages"].append(page)
+        self.pages.setdefault(page, []).append(name)
+        return name
+
+    def write_manifest(self, path: os.PathLike | str) -> None:
+        data = {"images": self.images, "pages": {str(p): names for p, names in sorted(self.pages.items())}}
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=1)
@@ -0,0 +1,123 @@
+"""
+labelassembly.py — Re-join tags that MuPDF splits into several words.
+
+CAD exports often place the parts of a tag separately ("BP" + "1",
+"P" + "-" + "1A"), so ``get_text("words")`` reports fragments and the
+counting scripts count "BP" and "1" instead of "BP1".  ``assemble_labels``
+merges such fragments back into one word before de-duplication:
+
+1. words are sorted by baseline (``y1``) and cut into text rows wherever the
+   baseline jumps by more than ``baseline_tol`` × word height;
+2. each row is swept left to right; consecutive short words (at most
+   ``max_fragment`` characters) of similar height whose horizontal gap is at
+   most ``gap`` × height form a run;
+3. inside a run, the longest sequences whose concatenation matches
+   ``pattern`` (a tag shape such as ``P1``, ``PF2A``, ``P-1A``) are merged
+   into one word with the union of their boxes; everything else is kept
+   as it was.
+
+Requiring the joined text to look like a tag keeps ordinary sentences
+("BORED PIERS @ 1500CTS") apart even though their word gaps are the same.
+Sorting is O(n log n), the sweep is linear.
+
+Usage
+-----
+    from labelassembly import assemble_labels
+    table = assemble_labels(WordTable.from_page(page))    # "BP" "1" → "BP1"
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Pattern, Union
+
+import numpy as np
+
+from wordtable import WordTable
+
+TAG_PATTERN = r"[A-Z]{1,3}-?\d{1,2}[A-Z]?"   # P1, BP1, PF2A, P-1A
+ASSEMBLE_GAP = 0.6       # max horizontal gap between fragments, in word heights
+BASELINE_TOL = 0.2       # max baseline offset on one row, in word heights
+MAX_FRAGMENT = 4         # longer words are never treated as fragments
+MAX_PARTS = 4            # at most this many fragments form one tag
+
+
+def _runs(order: List[int], x0, x1, y1, h, short, gap: float, baseline_tol: float) -> List[List[int]]:
+    """Split one row (indices sorted by x0) into runs of adjacent fragments."""
+    runs, run = [], [order[0]]
+    for i in order[1:]:
+        j = run[-1]
+        hh = max(h[i], h[j])
+        if (short[i] and short[j]
+                and -0.1 * hh <= x0[i] - x1[j] <= gap * hh
+                and abs(y1[i] - y1[j]) <= baseline_tol * hh
+                and abs(h[i] - h[j]) <= 0.25 * hh):
+            run.append(i)
+        else:
+            runs.append(run)
+            run = [i]
+    runs.append(run)
+    return runs
+
+
+def assemble_labels(table: WordTable, pattern: Union[str, Pattern] = TAG_PATTERN,
+                    gap: float = ASSEMBLE_GAP, baseline_tol: float = BASELINE_TOL,
+                    max_fragment: int = MAX_FRAGMENT) -> WordTable:
+    """Copy of ``table`` with split tags merged; see the module docstring."""
+    n = len(table)
+    if n < 2:
+        return table
+    rx = re.compile(pattern, re.IGNORECASE) if isinstance(pattern, str) else pattern
+
+    texts = table.texts
+    c = table.coords.astype(np.float64)
+    x0, y0, x1, y1 = (c[:, k].tolist() for k in range(4))
+    h = np.maximum(c[:, 3] - c[:, 1], 1e-6)
+    short = [0 < len(t.strip()) <= max_fragment for t in texts]
+
+    # rows: cut the baseline-sorted words where the baseline jumps
+    by_base = np.argsort(c[:, 3], kind="stable")
+    cuts = np.diff(c[by_base, 3]) > baseline_tol * h[by_base][1:]
+    row_id = np.empty(n, dtype=np.int64)
+    row_id[by_base] = np.concatenate(([0], np.cumsum(cuts)))
+    order = np.lexsort((c[:, 0], row_id))
+    starts = np.flatnonzero(np.r_[True, row_id[order][1:] != row_id[order][:-1]])
+    h = h.tolist()
+
+    merged: Dict[int, List[int]] = {}     # first index -> all merged indices
+    for a, b in zip(starts.tolist(), starts[1:].tolist() + [n]):
+        for run in _runs(order[a:b].tolist(), x0, x1, y1, h, short, gap, baseline_tol):
+            k = 0
+            while k < len(run) - 1:
+                best = None
+                joined = texts[run[k]].strip()
+                for m in range(k + 1, min(len(run), k + MAX_PARTS)):
+                    joined += texts[run[m]].strip()
+                    if rx.fullmatch(joined):
+                        best = m
+                if best is None:
+                    k += 1
+                else:
+                    merged[run[k]] = run[k:best + 1]
+                    k = best + 1
+    if not merged:
+        return table
+
+    # rebuild in original word order, merged words at the position of their first fragment
+    drop = {i for group in merged.values() for i in group[1:]}
+    keep = [i for i in range(n) if i not in drop]
+    coords = table.coords[keep].copy()
+    codes = table.codes[keep].copy()
+    vocab = list(table.vocab)
+    index = {t: k for k, t in enumerate(vocab)}
+    row_of = {i: r for r, i in enumerate(keep)}
+    for first, group in merged.items():
+        r = row_of[first]
+        coords[r] = (min(x0[i] for i in group), min(y0[i] for i in group),
+                     max(x1[i] for i in group), max(y1[i] for i in group))
+        text = "".join(texts[i].strip() for i in group)
+        if text not in index:
+            index[text] = len(vocab)
+            vocab.append(text)
+        codes[r] = index[text]
+    return WordTable(coords, codes, vocab, table.block[keep], table.line[keep],
+                     table.word[keep], table.sizes[keep])
@@ -0,0 +1,129 @@
+"""
+livecount.py — Incremental label counting while ROIs are being edited.
+
+``count_page`` recounts a page from scratch.  In the interactive selector
+that happens once at the end, so every extra rectangle used to mean a
+restart.  ``CountSession`` keeps the page's words in memory and updates the
+counts by the difference when an ROI is added, moved or removed:
+
+* words are indexed by centre x (sorted), so an ROI only tests the words in
+  its x-range;
+* every word keeps the number of ROIs covering its centre; a change only
+  touches words whose coverage goes 0 → 1 or 1 → 0;
+* de-duplication is order dependent (first occurrence wins), so it is
+  re-run only for the labels of those words, over that label's active
+  words — all other labels keep their boxes.
+
+The result is always identical to ``pagecount.count_page(page, rects)``.
+
+Usage
+-----
+    from livecount import CountSession
+    session = CountSession(page)
+    rid = session.add(rect)          # returns an ROI id
+    session.move(rid, new_rect)
+    session.remove(rid)
+    session.counts()                 # {label: n}
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Sequence, Set
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from labelassembly import assemble_labels
+from labeldedup import DEDUP_THRESHOLD, Coord, LabelDeduplicator
+from roifilter import assign_to_rois
+from wordtable import WordTable
+
+
+class CountSession:
+    """Per-page counting state for a set of ROIs that changes one ROI at a time."""
+
+    def __init__(self, page: fitz.Page, threshold: float = DEDUP_THRESHOLD, assemble: bool = False):
+        words = WordTable.from_page(page)
+        if assemble:
+            words = assemble_labels(words)
+        self.threshold = threshold
+        self._boxes = words.coords.astype(np.float64)
+        cx = (self._boxes[:, 0] + self._boxes[:, 2]) / 2
+        self._by_x = np.argsort(cx, kind="stable")
+        self._cx_sorted = cx[self._by_x]
+
+        # labels as dedup() sees them: stripped, empty ones never counted
+        names = [t.strip() for t in words.vocab]
+        label_ids: Dict[str, int] = {}
+        code_to_label = np.array([label_ids.setdefault(n, len(label_ids)) if n else -1 for n in names],
+                                 dtype=np.int64)
+        self._labels = list(label_ids)
+        self._label_of = code_to_label[words.codes] if len(words) else np.empty(0, dtype=np.int64)
+        order = np.argsort(self._label_of, kind="stable")           # page order within a label
+        bounds = np.searchsorted(self._label_of[order], np.arange(len(self._labels) + 1))
+        self._words_of = [order[bounds[k]:bounds[k + 1]] for k in range(len(self._labels))]
+
+        self._cover = np.zeros(len(words), dtype=np.int32)
+        self._rois: Dict[int, fitz.Rect] = {}
+        self._next_id = 0
+        self._kept: Dict[int, List[int]] = {}                        # label id -> kept word indices
+
+    # ---------------------------------------------------------------- editing
+    def _inside(self, rect: fitz.Rect) -> np.ndarray:
+        lo, hi = np.searchsorted(self._cx_sorted, [rect.x0, rect.x1], side="left")
+        candidates = self._by_x[lo:hi]
+        hit = assign_to_rois(self._boxes[candidates], [rect]) >= 0
+        return candidates[hit]
+
+    def _apply(self, rect: fitz.Rect, delta: int) -> Set[int]:
+        """Change coverage inside ``rect`` by ``delta``; labels whose active words changed."""
+        idx = self._inside(rect)
+        before = self._cover[idx] > 0
+        self._cover[idx] += delta
+        changed = idx[before != (self._cover[idx] > 0)]
+        return {int(lbl) for lbl in np.unique(self._label_of[changed]) if lbl >= 0}
+
+    def _recount(self, labels: Set[int]) -> None:
+        for lbl in labels:
+            idx = self._words_of[lbl]
+            idx = idx[self._cover[idx] > 0]
+            index = LabelDeduplicator(self.threshold)
+            kept = [i for i, box in zip(idx.tolist(), self._boxes[idx].tolist()) if index.add("", box)]
+            if kept:
+                self._kept[lbl] = kept
+            else:
+                self._kept.pop(lbl, None)
+
+    def add(self, rect: Sequence[float]) -> int:
+        rid = self._next_id
+        self._next_id += 1
+        self._rois[rid] = fitz.Rect(rect)
+        self._recount(self._apply(self._rois[rid], +1))
+        return rid
+
+    def remove(self, rid: int) -> None:
+        self._recount(self._apply(self._rois.pop(rid), -1))
+
+    def move(self, rid: int, rect: Sequence[float]) -> None:
+        changed = self._apply(self._rois[rid], -1)
+        self._rois[rid] = fitz.Rect(rect)
+        self._recount(changed | self._apply(self._rois[rid], +1))
+
+    # ----------------------------------------------------------------- result
+    @property
+    def rects(self) -> List[fitz.Rect]:
+        return list(self._rois.values())
+
+    def counts(self) -> Dict[str, int]:
+        return {self._labels[lbl]: len(kept) for lbl, kept in self._sorted()}
+
+    def total(self) -> int:
+        return sum(len(kept) for kept in self._kept.values())
+
+    def occurrences(self) -> Dict[str, List[Coord]]:
+        """``{label: [boxes]}`` in the same order as ``labeldedup.dedup``."""
+        return {self._labels[lbl]: [tuple(self._boxes[i].tolist()) for i in kept]
+                for lbl, kept in self._sorted()}
+
+    def _sorted(self):
+        # dedup() lists labels in the order their first kept word appears on the page
+        return sorted(self._kept.items(), key=lambda item: item[1][0])
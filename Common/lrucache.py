@@ -0,0 +1,133 @@
+"""
+lrucache.py — Size-bounded cache directory shared by ``wordcache`` and
+``detectcache``.
+
+Entries live in ``<directory>/<2-char prefix>/<name><suffix>``.  Every hit
+refreshes the file's mtime and, when a write takes the total size over the
+limit, the least recently used files are deleted until it is below 90 % of
+it (``LOW_WATER``).  The directory is scanned once per process; after that
+a running total of this process's writes decides when to scan and evict
+again, so a run over N pages does not stat the whole cache N times.  Files
+written by other processes meanwhile are only seen at the next scan, so
+the limit can be overshot by what concurrent workers write between scans.
+
+A subclass names its file suffixes, default location and size, and the
+prefix of its two environment variables:
+  <ENV>       cache directory, or "off" to disable
+  <ENV>_MB    size limit in MiB
+
+Usage
+-----
+    class ThingCache(CacheDir):
+        SUFFIXES = (".bin",)
+        ENV = "PDFIT2_THING_CACHE"
+        DEFAULT_DIR = Path.home() / ".cache" / "pdfit2" / "things"
+        DEFAULT_MB = 256
+
+    cache = ThingCache.from_env()          # None when disabled
+    cache.write(path, lambda fh: fh.write(data))
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, ClassVar, Dict, IO, Iterator, Optional, Tuple
+
+LOW_WATER = 0.9   # eviction stops at this fraction of the limit
+
+
+class CacheDir:
+    """LRU-bounded directory of cache files; subclasses add the entry format."""
+
+    SUFFIXES: ClassVar[Tuple[str, ...]] = ()
+    ENV: ClassVar[str] = ""
+    DEFAULT_DIR: ClassVar[Path]
+    DEFAULT_MB: ClassVar[int]
+
+    def __init__(self, directory: os.PathLike | str | None = None, max_bytes: Optional[int] = None):
+        self.directory = Path(self.DEFAULT_DIR if directory is None else directory)
+        self.max_bytes = self.DEFAULT_MB << 20 if max_bytes is None else max_bytes
+        self._size: Optional[int] = None   # bytes in the directory as of the last scan + our writes
+
+    def _files(self) -> Iterator[Path]:
+        for p in self.directory.glob("*/*.*"):
+            if p.suffix in self.SUFFIXES:
+                yield p
+
+    @staticmethod
+    def touch(*paths: Path) -> None:
+        """Refresh the LRU position of ``paths``."""
+        for p in paths:
+            try:
+                os.utime(p)
+            except OSError:
+                pass
+
+    def write(self, path: Path, write: Callable[[IO[bytes]], object]) -> None:
+        """Write-then-rename so concurrent workers never read a partial file, then evict if due."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                write(fh)
+            written = os.path.getsize(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        if self._size is None:
+            self.evict()                    # first write: scan once to learn the size
+        else:
+            self._size += written - replaced
+            if self._size > self.max_bytes:
+                self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used files until the cache fits ``max_bytes`` (scans the directory)."""
+        entries = []
+        for p in self._files():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            self._size = total
+            return
+        # down to the low-water mark: the next scan is (1 - LOW_WATER) of the limit of writes away
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes * LOW_WATER:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+    def clear(self) -> None:
+        for p in list(self._files()):
+            p.unlink(missing_ok=True)
+        self._size = 0
+
+    @classmethod
+    def from_env(cls) -> Optional[CacheDir]:
+        """Cache configured by ``ENV`` / ``ENV_MB``, or None when disabled.
+
+        One instance per configuration and process, so the running size
+        total is kept between calls.
+        """
+        location = os.environ.get(cls.ENV, "")
+        if location.lower() in ("off", "0", "none"):
+            return None
+        mb = int(os.environ.get(f"{cls.ENV}_MB", cls.DEFAULT_MB))
+        key = (cls, location or str(cls.DEFAULT_DIR), mb)
+        if key not in _caches:
+            _caches[key] = cls(key[1], mb << 20)
+        return _caches[key]
+
+
+_caches: Dict[Tuple[type, str, int], CacheDir] = {}
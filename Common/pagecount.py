@@ -0,0 +1,148 @@
+"""
+pagecount.py — Label counting over many pages of a drawing set.
+
+The same ROIs (in PDF points) are applied to every selected page; each page
+is loaded as a ``wordtable.WordTable``, filtered to the ROIs, optionally
+has split tags re-joined (``labelassembly``) and is de-duplicated with
+``labeldedup.dedup``.  Pages are spread over a process pool and every worker
+opens its own ``fitz.Document`` (documents cannot be shared between
+processes), so a 300-page set uses all cores.
+
+Usage
+-----
+    from pagecount import parse_page_range, count_pages, counts_table
+    pages   = parse_page_range("1-5,9", page_count)
+    results = count_pages(pdf_path, pages, rois)      # {page: {label: boxes}}
+    counts_table(results).to_excel("label_counts.xlsx", index=False)
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import pandas as pd
+
+from labelassembly import assemble_labels
+from labeldedup import DEDUP_THRESHOLD, Coord, dedup
+from wordtable import WordTable
+
+PageResult = Dict[str, List[Coord]]
+
+
+def parse_page_range(spec: str, page_count: int) -> List[int]:
+    """Parse a 1-based page range such as ``"1-3,7,10-"`` into 0-based indices.
+
+    An empty spec or ``"all"`` selects every page.  Pages outside the
+    document are ignored (``"5-"`` of a 3-page document selects nothing);
+    duplicates are removed, order is ascending.  Raises ``ValueError`` for a
+    spec that is not a page range, or a range whose end is before its start.
+    """
+    spec = spec.strip().lower()
+    if spec in ("", "all", "*"):
+        return list(range(page_count))
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, _, end = part.partition("-")
+            first = int(start) if start.strip() else 1
+            last = int(end) if end.strip() else page_count
+        else:
+            first = last = int(part)
+        if first > last and end.strip():
+            raise ValueError(f"invalid page range: {part!r}")
+        pages.update(range(max(first, 1) - 1, min(last, page_count)))
+    return sorted(pages)
+
+
+def _rect_tuples(rects: Optional[Iterable[Sequence[float]]]) -> Optional[List[Tuple[float, ...]]]:
+    # fitz.Rect is not guaranteed to pickle across versions; send plain tuples
+    return None if rects is None else [tuple(r)[:4] for r in rects]
+
+
+def count_page(page: fitz.Page, rects: Optional[Sequence[Sequence[float]]] = None,
+               threshold: float = DEDUP_THRESHOLD, assemble: bool = False) -> PageResult:
+    """De-duplicated label boxes of one page; ``rects=None`` counts the whole page.
+
+    With ``assemble`` tags split over several words ("BP" "1") are joined
+    first; fragments are joined before the ROI filter so a tag is kept when
+    its assembled centre is inside.
+    """
+    words = WordTable.from_page(page)
+    if assemble:
+        words = assemble_labels(words)
+    if rects is not None:
+        words = words.in_rects(rects)
+    return dedup(words, threshold)
+
+
+def _count_worker(page_indices: Sequence[int], pdf_path: str,
+                  rects: Optional[List[Tuple[float, ...]]], threshold: float,
+                  assemble: bool = False) -> List[Tuple[int, PageResult]]:
+    with fitz.open(pdf_path) as doc:
+        return [(i, count_page(doc[i], rects, threshold, assemble)) for i in page_indices]
+
+
+def count_pages(pdf_path: Path | str, pages: Optional[Sequence[int]] = None,
+                rects: Optional[Iterable[Sequence[float]]] = None,
+                threshold: float = DEDUP_THRESHOLD,
+                jobs: Optional[int] = None, assemble: bool = False) -> Dict[int, PageResult]:
+    """Count labels on ``pages`` (0-based, default all) of ``pdf_path``.
+
+    Returns ``{page_index: {label: [boxes]}}`` in page order.  ``jobs``
+    defaults to the CPU count; with one job or one page no pool is started.
+    """
+    pdf_path = str(pdf_path)
+    if pages is None:
+        with fitz.open(pdf_path) as doc:
+            pages = range(len(doc))
+    pages = list(pages)
+    rects = _rect_tuples(rects)
+    jobs = min(jobs or os.cpu_count() or 1, len(pages)) if pages else 1
+
+    if jobs <= 1:
+        return dict(_count_worker(pages, pdf_path, rects, threshold, assemble))
+
+    # one shard per worker: each opens the PDF once; striding balances dense/sparse sheets
+    shards = [pages[k::jobs] for k in range(jobs)]
+    worker = partial(_count_worker, pdf_path=pdf_path, rects=rects, threshold=threshold, assemble=assemble)
+    results: Dict[int, PageResult] = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for shard in pool.map(worker, shards):
+            results.update(shard)
+    return {i: results[i] for i in pages}
+
+
+def page_counts(results: Dict[int, PageResult]) -> Dict[int, Dict[str, int]]:
+    return {i: {lbl: len(boxes) for lbl, boxes in res.items()} for i, res in results.items()}
+
+
+def total_counts(results: Dict[int, PageResult]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for res in results.values():
+        for lbl, boxes in res.items():
+            totals[lbl] = totals.get(lbl, 0) + len(boxes)
+    return totals
+
+
+def counts_table(results: Dict[int, PageResult], label_col: str = "Element",
+                 total_col: str = "Count") -> pd.DataFrame:
+    """One row per label: per-page columns ``Page N`` (1-based) plus a total.
+
+    With a single page only the label and total columns are written, which
+    keeps the two-column layout of the single-page scripts.
+    """
+    totals = total_counts(results)
+    df = pd.DataFrame({label_col: list(totals), total_col: list(totals.values())})
+    if len(results) > 1:
+        per_page = page_counts(results)
+        for i, counts in per_page.items():
+            df.insert(len(df.columns) - 1, f"Page {i + 1}",
+                      [counts.get(lbl, 0) for lbl in totals])
+    return df
@@ -0,0 +1,107 @@
+"""
+preview.py — Count preview images rendered through a clip rectangle.
+
+The previews only show label boxes inside the counted regions, yet used to
+render the whole sheet: an A0 page at 2× is a 100+ MB RGB buffer, most of
+it never looked at.  ``render_preview`` renders only the bounding box of
+the ROIs plus a margin and, when ``max_pixels`` is given, lowers the zoom
+so the image never exceeds that many pixels.
+
+Boxes and ROIs are in unrotated page coordinates (as returned by
+``get_text("words")``); they are mapped to the rotated page view that
+``get_pixmap`` renders.
+
+When the page has already been rendered for another purpose (e.g. the YOLO
+detection in newPredict), ``preview_from_render`` crops that image instead
+of rendering the page a second time.
+
+Usage
+-----
+    from preview import render_preview
+    img = render_preview(page, {"P1": boxes}, rois=[roi], zoom=2.0, max_pixels=25_000_000)
+    img.save("preview.png")
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, Optional, Sequence
+
+import fitz  # PyMuPDF
+import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw, ImageFont
+
+PREVIEW_MARGIN = 20.0  # PDF points around the ROIs
+
+
+def fit_zoom(clip: fitz.Rect, zoom: float, max_pixels: Optional[int] = None) -> float:
+    """``zoom`` reduced so that ``clip`` renders to at most ``max_pixels`` pixels."""
+    if max_pixels and clip.width * clip.height * zoom * zoom > max_pixels:
+        zoom = math.sqrt(max_pixels / (clip.width * clip.height))
+    return zoom
+
+
+def preview_clip(page: fitz.Page, rois: Optional[Iterable[Sequence[float]]] = None,
+                 margin: float = PREVIEW_MARGIN) -> fitz.Rect:
+    """Bounding box of ``rois`` plus ``margin`` in page view coordinates (whole page if no ROIs)."""
+    return roi_clip(page.rect, page.rotation_matrix, rois, margin)
+
+
+def roi_clip(page_rect: Sequence[float], rotation: Sequence[float],
+             rois: Optional[Iterable[Sequence[float]]] = None,
+             margin: float = PREVIEW_MARGIN) -> fitz.Rect:
+    """``preview_clip`` from the page's ``rect`` and ``rotation_matrix``, without the page itself."""
+    clip = fitz.Rect()
+    for r in rois or ():
+        clip |= fitz.Rect(r) * fitz.Matrix(rotation)
+    if clip.is_empty:
+        return fitz.Rect(page_rect)
+    return (clip + (-margin, -margin, margin, margin)) & fitz.Rect(page_rect)
+
+
+def draw_boxes(img: Image.Image, page: fitz.Page, occurrences: Dict[str, Iterable[Sequence[float]]],
+               clip: fitz.Rect, zoom: float, font_size: int = 16) -> Image.Image:
+    """Draw each label's boxes in its own tab10 colour on a render of ``clip`` at ``zoom``."""
+    draw = ImageDraw.Draw(img)
+    cmap = plt.get_cmap("tab10")
+    try:
+        font = ImageFont.truetype("arial.ttf", font_size)
+    except IOError:
+        font = ImageFont.load_default()
+
+    # unrotated PDF coords -> pixel coords of the clipped render
+    to_pixels = page.rotation_matrix * fitz.Matrix(1, 0, 0, 1, -clip.x0, -clip.y0) * fitz.Matrix(zoom, zoom)
+    for i, (label, boxes) in enumerate(occurrences.items()):
+        rgb = tuple(int(255 * c) for c in cmap(i % 10)[:3])
+        for b in boxes:
+            r = fitz.Rect(b[:4]) * to_pixels
+            draw.rectangle([r.x0, r.y0, r.x1, r.y1], outline=rgb, width=2)
+            draw.text((r.x0, r.y0), label, fill=rgb, font=font)
+    return img
+
+
+def render_preview(page: fitz.Page, occurrences: Dict[str, Iterable[Sequence[float]]],
+                   rois: Optional[Iterable[Sequence[float]]] = None, zoom: float = 2.0,
+                   max_pixels: Optional[int] = None, margin: float = PREVIEW_MARGIN,
+                   font_size: int = 16) -> Image.Image:
+    """Render the ROI area of ``page`` and draw the label boxes on it."""
+    clip = preview_clip(page, rois, margin)
+    zoom = fit_zoom(clip, zoom, max_pixels)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+    img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    return draw_boxes(img, page, occurrences, clip, zoom, font_size)
+
+
+def preview_from_render(full_img: Image.Image, render_zoom: float, page: fitz.Page,
+                        occurrences: Dict[str, Iterable[Sequence[float]]],
+                        rois: Optional[Iterable[Sequence[float]]] = None,
+                        margin: float = PREVIEW_MARGIN, font_size: int = 16,
+                        origin: Sequence[float] = (0.0, 0.0)) -> Image.Image:
+    """Like ``render_preview`` but cropped from an existing render at ``render_zoom``.
+
+    ``origin`` is the page view point at the top-left of ``full_img``, for a
+    render of only part of the page; it must contain the preview clip.
+    """
+    clip = preview_clip(page, rois, margin)
+    box = (clip - (*origin, *origin)) * fitz.Matrix(render_zoom, render_zoom)
+    img = full_img.crop((round(box.x0), round(box.y0), round(box.x1), round(box.y1)))
+    return draw_boxes(img, page, occurrences, clip, render_zoom, font_size)
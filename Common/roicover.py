@@ -0,0 +1,108 @@
+"""
+roicover.py — Complement of the kept regions (ROIs) on a page.
+
+Everything outside the ROIs is whited out with one redaction annotation per
+cover rectangle, so the number of rectangles drives the cost of
+``apply_redactions()``.  Splitting every cover fragment against every ROI
+in turn makes the fragment count grow with each ROI; instead the page is
+swept top to bottom:
+
+1. the distinct ROI edges cut the page into horizontal bands;
+2. in each band the uncovered x-intervals are the gaps between the merged
+   ROI intervals spanning it;
+3. an interval identical to one in the band above extends that rectangle
+   downwards instead of starting a new one.
+
+The result is a set of non-overlapping rectangles covering exactly the
+page minus the ROIs — for a single ROI the usual top/bottom/left/right
+four — and typically far fewer than the fragment-splitting approach once
+there are dozens of ROIs.
+
+``mask_outside`` applies the complement to a document in one of two modes:
+
+  • redact  — redaction annotations + ``apply_redactions()``; text and
+              graphics outside the ROIs are really removed (slow on heavy
+              CAD pages, the whole content stream is rewritten)
+  • overlay — one white filled path per page drawn on top; same visual
+              result, nothing is removed, a single content-stream append
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+
+def _gaps(lo: float, hi: float, intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    """Parts of [lo, hi] not covered by ``intervals`` (sorted by start)."""
+    gaps = []
+    cursor = lo
+    for a, b in intervals:
+        if a > cursor:
+            gaps.append((cursor, a))
+        cursor = max(cursor, b)
+        if cursor >= hi:
+            break
+    if cursor < hi:
+        gaps.append((cursor, hi))
+    return gaps
+
+
+def subtract_rects(full_rect: Sequence[float], sub_rects: Iterable[Sequence[float]]) -> List[fitz.Rect]:
+    """Cover ``full_rect`` minus all ``sub_rects`` with non-overlapping rectangles."""
+    full = fitz.Rect(full_rect)
+    rois = []
+    for r in sub_rects:
+        clipped = fitz.Rect(r) & full
+        if clipped.width > 0 and clipped.height > 0:
+            rois.append(clipped)
+    if not rois:
+        return [full]
+
+    ys = sorted({full.y0, full.y1, *(r.y0 for r in rois), *(r.y1 for r in rois)})
+    covers: List[fitz.Rect] = []
+    open_rects: Dict[Tuple[float, float], float] = {}   # (x0, x1) -> y0 of the open rectangle
+
+    for y0, y1 in zip(ys, ys[1:]):
+        spanning = sorted((r.x0, r.x1) for r in rois if r.y0 <= y0 and r.y1 >= y1)
+        band = set(_gaps(full.x0, full.x1, spanning))
+        for key in list(open_rects):
+            if key not in band:                                # interval ends above this band
+                covers.append(fitz.Rect(key[0], open_rects.pop(key), key[1], y0))
+        for key in band:
+            open_rects.setdefault(key, y0)
+
+    for (x0, x1), y0 in open_rects.items():
+        covers.append(fitz.Rect(x0, y0, x1, full.y1))
+    covers.sort(key=lambda r: (r.y0, r.x0))
+    return covers
+
+
+MASK_MODES = ("redact", "overlay")
+
+
+def _unrotated_rect(page: fitz.Page) -> fitz.Rect:
+    """``page.rect`` in the unrotated coordinates used by words, redactions and drawings."""
+    return page.rect * page.derotation_matrix
+
+
+def mask_outside(doc: fitz.Document, page_indices: Iterable[int],
+                 rois: Sequence[Sequence[float]], mode: str = "redact",
+                 fill: Sequence[float] = (1, 1, 1)) -> None:
+    """Hide everything outside ``rois`` on the given pages of ``doc`` in place."""
+    if mode not in MASK_MODES:
+        raise ValueError(f"unknown mask mode {mode!r}, expected one of {MASK_MODES}")
+    rois = [fitz.Rect(r) for r in rois]
+    for i in page_indices:
+        page = doc[i]
+        covers = subtract_rects(_unrotated_rect(page), rois)
+        if mode == "redact":
+            for cr in covers:
+                page.add_redact_annot(cr, fill=fill)
+            page.apply_redactions()
+        else:
+            shape = page.new_shape()
+            for cr in covers:
+                shape.draw_rect(cr)
+            shape.finish(width=0, color=None, fill=fill)
+            shape.commit(overlay=True)
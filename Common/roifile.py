@@ -0,0 +1,92 @@
+"""
+roifile.py — Load counting regions (ROIs) from a JSON or CSV file.
+
+Headless runs cannot use the matplotlib selector, so the regions are read
+from a file instead.  All coordinates are PDF points (x0, y0, x1, y1), i.e.
+the values Counting.py prints as "The converted PDF selection coordinates".
+
+JSON — per file and/or per sheet template::
+
+    {
+      "templates": {"A1-plan": [[100, 80, 1500, 900], [1600, 80, 2300, 900]]},
+      "files":     {"1.pdf": "A1-plan", "3": [[50, 50, 800, 600]]},
+      "default":   "A1-plan"
+    }
+
+A plain ``{"1.pdf": [[...]], ...}`` mapping is read as the "files" section.
+
+CSV — one region per row, several rows per target::
+
+    target,x0,y0,x1,y1
+    1.pdf,100,80,1500,900
+    *,50,50,800,600
+
+Targets are matched by file name first, then by stem; ``*`` is the default.
+"""
+from __future__ import annotations
+
+import csv
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+Rect = Tuple[float, float, float, float]
+_RectSource = Union[str, List]
+
+
+def _normalise(rect) -> Rect:
+    x0, y0, x1, y1 = map(float, rect)
+    return (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+
+
+class RoiSpec:
+    """ROIs per PDF file, optionally shared through named sheet templates."""
+
+    def __init__(self, files: Optional[Dict[str, _RectSource]] = None,
+                 templates: Optional[Dict[str, List]] = None,
+                 default: Optional[_RectSource] = None):
+        self.templates = {k: [_normalise(r) for r in v] for k, v in (templates or {}).items()}
+        self.files = dict(files or {})
+        self.default = default
+
+    def _resolve(self, source: _RectSource) -> List[Rect]:
+        if isinstance(source, str):
+            if source not in self.templates:
+                raise KeyError(f"unknown ROI template: {source!r}")
+            return self.templates[source]
+        return [_normalise(r) for r in source]
+
+    def rois_for(self, pdf_path: Union[Path, str]) -> Optional[List[Rect]]:
+        """Regions for ``pdf_path``, or None if neither the file nor a default is listed."""
+        pdf_path = Path(pdf_path)
+        for key in (pdf_path.name, pdf_path.stem):
+            if key in self.files:
+                return self._resolve(self.files[key])
+        if self.default is not None:
+            return self._resolve(self.default)
+        return None
+
+
+def _load_json(path: Path) -> RoiSpec:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if not ({"files", "templates", "default"} & data.keys()):
+        return RoiSpec(files=data)
+    return RoiSpec(data.get("files"), data.get("templates"), data.get("default"))
+
+
+def _load_csv(path: Path) -> RoiSpec:
+    files: Dict[str, List[Rect]] = {}
+    with path.open(newline="", encoding="utf-8-sig") as fh:
+        for row in csv.DictReader(fh):
+            target = row["target"].strip()
+            files.setdefault(target, []).append(
+                _normalise((row["x0"], row["y0"], row["x1"], row["y1"])))
+    default = files.pop("*", None)
+    return RoiSpec(files=files, default=default)
+
+
+def load_roi_file(path: Union[Path, str]) -> RoiSpec:
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        return _load_csv(path)
+    return _load_json(path)
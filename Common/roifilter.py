@@ -0,0 +1,53 @@
+"""
+roifilter.py — Vectorised word-in-region tests for the counting scripts.
+
+The counting scripts keep a word when its centre lies inside one of the
+selected regions (ROIs).  Testing every word against every ROI with
+``fitz.Rect.contains(fitz.Point(...))`` is a Python double loop; here all
+word boxes are loaded into an (N, 4) array, the centres are computed once
+and every word is assigned to its first containing ROI with a single
+broadcasted comparison.
+
+Containment follows MuPDF's ``fz_is_point_inside_rect``:
+``x0 <= cx < x1 and y0 <= cy < y1``.
+
+Usage
+-----
+    from roifilter import select_words
+    words_in_roi = select_words(page.get_text("words"), pdf_rects)
+"""
+from __future__ import annotations
+
+from typing import List, Sequence
+
+import numpy as np
+
+
+def word_boxes(words: Sequence[Sequence]) -> np.ndarray:
+    """(N, 4) float array of ``(x0, y0, x1, y1)`` from ``get_text("words")``."""
+    if len(words) == 0:
+        return np.empty((0, 4), dtype=np.float64)
+    return np.array([w[:4] for w in words], dtype=np.float64)
+
+
+def assign_to_rois(boxes: np.ndarray, rects: Sequence[Sequence[float]]) -> np.ndarray:
+    """Index of the first ROI containing each box centre, -1 if none.
+
+    ``rects`` may be ``fitz.Rect`` objects or plain ``(x0, y0, x1, y1)`` tuples.
+    """
+    n = len(boxes)
+    if n == 0 or len(rects) == 0:
+        return np.full(n, -1, dtype=np.intp)
+    roi = np.array([tuple(r)[:4] for r in rects], dtype=np.float64)    # (R, 4)
+    cx = ((boxes[:, 0] + boxes[:, 2]) / 2)[:, None]                      # (N, 1)
+    cy = ((boxes[:, 1] + boxes[:, 3]) / 2)[:, None]
+    inside = ((roi[:, 0] <= cx) & (cx < roi[:, 2]) &
+              (roi[:, 1] <= cy) & (cy < roi[:, 3]))                       # (N, R)
+    first = inside.argmax(axis=1)
+    return np.where(inside[np.arange(n), first], first, -1)
+
+
+def select_words(words: Sequence[Sequence], rects: Sequence[Sequence[float]]) -> List:
+    """Words whose centre lies inside any of ``rects``, in original order."""
+    hit = assign_to_rois(word_boxes(words), rects)
+    return [words[i] for i in np.flatnonzero(hit >= 0)]
@@ -0,0 +1,178 @@
+"""
+schedule.py — Merge label counts with the component schedule.
+
+``Counting.py`` / ``batchcount.py`` write one ``label_counts.xlsx`` per
+drawing with *every* text on the sheet; turning that into quantities means
+keeping only the schedule marks (P1, PF1A, C4 …) and adding them up across
+drawings.  This module does it in one step:
+
+1. the schedule is loaded into a table indexed by a normalised mark key
+   (upper case, whitespace removed) — from an .xlsx/.csv file or straight
+   from a schedule table on a sheet (``page.find_tables``);
+2. the counts of all drawings are stacked into one long table
+   ``Drawing, Label, Count``;
+3. a single ``merge`` on the key splits it into schedule items and
+   unmatched labels; the matched part is pivoted to one column per drawing
+   and re-indexed in schedule order.
+
+Usage
+-----
+    from schedule import load_schedule, read_counts, merge_schedule
+    totals, unmatched = merge_schedule(load_schedule("schedule.xlsx"),
+                                       read_counts(Path("counted").glob("*_label_counts.xlsx")))
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import pandas as pd
+
+from wordtable import WordTable
+
+MARK_COLUMNS = ("mark", "tag", "label", "element", "type", "id")
+KEY = "_key"
+COUNTS_SUFFIX = "_label_counts"
+
+
+def normalise_labels(labels: pd.Series) -> pd.Series:
+    """Join key for marks and labels: upper case, no whitespace ("p 1" == "P1")."""
+    return labels.astype(str).str.upper().str.replace(r"\s+", "", regex=True)
+
+
+def _mark_column(columns: Sequence) -> object:
+    by_name = {str(c).strip().lower(): c for c in columns}
+    return next((by_name[c] for c in MARK_COLUMNS if c in by_name), columns[0])
+
+
+def _indexed(df: pd.DataFrame) -> pd.DataFrame:
+    """Schedule with a ``Mark`` first column and a unique key column, rows in sheet order."""
+    mark = _mark_column(list(df.columns))
+    df = df.rename(columns={mark: "Mark"})
+    df = df[df["Mark"].notna() & (df["Mark"].astype(str).str.strip() != "")].copy()
+    df["Mark"] = df["Mark"].astype(str).str.strip()
+    df[KEY] = normalise_labels(df["Mark"])
+    df = df.drop_duplicates(KEY).reset_index(drop=True)
+    return df[["Mark"] + [c for c in df.columns if c != "Mark"]]
+
+
+def load_schedule(path: Path | str, sheet: Optional[str | int] = 0) -> pd.DataFrame:
+    """Schedule from .csv or .xlsx/.xls; the mark column is ``Mark``/``Tag``/… or the first one."""
+    path = Path(path)
+    if path.suffix.lower() == ".csv":
+        df = pd.read_csv(path, dtype=str)
+    else:
+        df = pd.read_excel(path, sheet_name=sheet, dtype=str)
+    return _indexed(df)
+
+
+def _table_rows(rows: Sequence[Sequence[Optional[str]]]) -> Optional[pd.DataFrame]:
+    """Rows of a found table below its header row (the one with a MARK/TAG… cell)."""
+    for h, row in enumerate(rows):
+        names = [(c or "").replace("\n", " ").strip() for c in row]
+        if any(n.lower() in MARK_COLUMNS for n in names):
+            header = [n or f"Column {j + 1}" for j, n in enumerate(names)]
+            body = [[(c or "").replace("\n", " ").strip() for c in r] for r in rows[h + 1:]]
+            return pd.DataFrame(body, columns=header)
+    return None
+
+
+def schedule_from_page(page: fitz.Page, rect: Optional[Sequence[float]] = None) -> pd.DataFrame:
+    """Schedule read from the sheet itself.
+
+    Every table inside ``rect`` (whole page if None) that has a MARK/TAG…
+    header row contributes its rows.  When MuPDF finds no such table the
+    first word of each text line inside ``rect`` is taken as a mark.
+    """
+    clip = fitz.Rect(rect) if rect is not None else None
+    frames = []
+    for table in page.find_tables(clip=clip).tables:
+        df = _table_rows(table.extract())
+        if df is not None:
+            frames.append(df)
+    if frames:
+        return _indexed(pd.concat(frames, ignore_index=True))
+
+    words = WordTable.from_page(page)
+    if clip is not None:
+        words = words.in_rects([clip])
+    lines = sorted(words.text_lines(), key=lambda t: (t[1], t[0]))
+    marks = [text.split()[0] for _, _, text in lines if text.split()]
+    return _indexed(pd.DataFrame({"Mark": marks}))
+
+
+def counts_long(counts: Mapping[str, Mapping[str, int]]) -> pd.DataFrame:
+    """``{drawing: {label: count}}`` → long table ``Drawing, Label, Count``."""
+    rows = [(d, lbl, n) for d, per_label in counts.items() for lbl, n in per_label.items()]
+    return pd.DataFrame(rows, columns=["Drawing", "Label", "Count"])
+
+
+def read_counts(paths: Iterable[Path | str]) -> pd.DataFrame:
+    """Stack ``*_label_counts.xlsx`` files: first column = label, last column = total."""
+    frames = []
+    for p in sorted(Path(p) for p in paths):
+        df = pd.read_excel(p)
+        if df.empty:
+            continue
+        name = p.stem[:-len(COUNTS_SUFFIX)] if p.stem.endswith(COUNTS_SUFFIX) else p.stem
+        frames.append(pd.DataFrame({"Drawing": name, "Label": df.iloc[:, 0].astype(str),
+                                    "Count": pd.to_numeric(df.iloc[:, -1], errors="coerce").fillna(0)}))
+    if not frames:
+        return pd.DataFrame(columns=["Drawing", "Label", "Count"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _drawing_columns(drawings: Sequence[str], taken: Iterable) -> Dict[str, str]:
+    """Column name per drawing; names clashing with ``taken`` get a " (drawing)" suffix."""
+    used = {str(c) for c in taken}
+    columns = {}
+    for d in drawings:
+        name, n = str(d), 1
+        while name in used:
+            n += 1
+            name = f"{d} (drawing)" if n == 2 else f"{d} (drawing {n - 1})"
+        used.add(name)
+        columns[d] = name
+    return columns
+
+
+def merge_schedule(schedule: pd.DataFrame, counts: pd.DataFrame,
+                   drop_zero: bool = False) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Join ``counts`` (long table) against ``schedule`` (from ``load_schedule``).
+
+    Returns ``(totals, unmatched)``: ``totals`` has the schedule columns, one
+    column per drawing and ``Total``, in schedule order (rows without any
+    count dropped when ``drop_zero``); a drawing named like a schedule column
+    or ``Total`` gets a " (drawing)" suffix.  ``unmatched`` lists the labels
+    that are not in the schedule with the number of drawings and their total.
+    """
+    counts = counts.assign(**{KEY: normalise_labels(counts["Label"])})
+    merged = counts.merge(schedule[[KEY]], on=KEY, how="left", indicator=True)
+    matched = merged[merged["_merge"] == "both"]
+
+    names = _drawing_columns(list(dict.fromkeys(counts["Drawing"])), [*schedule.columns, "Total"])
+    drawings = list(names.values())
+    per_drawing = (matched.pivot_table(index=KEY, columns="Drawing", values="Count",
+                                       aggfunc="sum", fill_value=0)
+                   .reindex(columns=list(names), fill_value=0)
+                   .rename(columns=names))
+    totals = schedule.join(per_drawing, on=KEY)
+    totals[drawings] = totals[drawings].fillna(0).astype(int)
+    totals["Total"] = totals[drawings].sum(axis=1).astype(int)
+    if drop_zero:
+        totals = totals[totals["Total"] > 0]
+    totals = totals.drop(columns=KEY).reset_index(drop=True)
+
+    unmatched = (merged[merged["_merge"] == "left_only"]
+                 .groupby("Label", sort=False)
+                 .agg(Drawings=("Drawing", "nunique"), Count=("Count", "sum"))
+                 .sort_values("Count", ascending=False, kind="stable")
+                 .reset_index())
+    return totals, unmatched
+
+
+def write_merged(totals: pd.DataFrame, unmatched: pd.DataFrame, path: Path | str) -> None:
+    with pd.ExcelWriter(path) as writer:
+        totals.to_excel(writer, sheet_name="Totals", index=False)
+        unmatched.to_excel(writer, sheet_name="Unmatched", index=False)
@@ -0,0 +1,186 @@
+"""
+svgstream.py — Drop SVG elements in one forward pass with constant memory.
+
+Building a BeautifulSoup / ElementTree tree of a CAD page costs several
+times the SVG size, and ``prettify`` then adds indentation to every one of
+the tens of thousands of paths.  ``SvgFilter`` instead runs expat
+incrementally: the SVG is fed in chunks, every element whose local name is
+in ``drop`` is skipped together with its content, and everything else is
+written back out as soon as it has been parsed.  Only the pending start tag
+and the current text run are held, so memory does not depend on the
+document size.
+
+Output is compact: attributes keep their order, empty elements are
+self-closed, comments and whitespace-only text between structural tags are
+left out.  Character data inside text content elements (``<text>``,
+``<tspan>``, ``<title>``, ``<style>`` … — ``TEXT_ELEMENTS``) and under
+``xml:space="preserve"`` is kept as it is, whitespace included.
+Qualified names are kept as written (expat runs without namespace
+processing), so prefixes and ``xmlns`` declarations pass through
+unchanged; ``drop`` matches local names ("circle" also matches
+"svg:circle").
+
+Usage
+-----
+    from svgstream import filter_svg_file, filter_svg_string
+    filter_svg_file("page.svg", "page_clean.svg", drop=("circle",))
+    svg = filter_svg_string(page.get_svg_image(), drop=("image", "text"))
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+from typing import Callable, Iterable, List, Optional, Union
+from xml.parsers import expat
+from xml.sax.saxutils import escape
+
+CHUNK = 1 << 16
+# elements whose character data is content: whitespace in them is kept
+TEXT_ELEMENTS = frozenset({"text", "tspan", "textPath", "tref", "altGlyph", "title", "desc",
+                           "style", "script"})
+_ATTR_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\t": "&#9;", "\r": "&#13;"}
+_needs_escape = re.compile(r'[&<>"\n\t\r]').search   # path data almost never does
+
+
+def _local(name: str) -> str:
+    return name.rpartition(":")[2]
+
+
+class SvgFilter:
+    """Incremental filter: ``feed`` chunks of the SVG, output goes to ``write`` as it is produced."""
+
+    def __init__(self, drop: Iterable[str], write: Callable[[str], object]):
+        self.drop = frozenset(drop)
+        self.write = write
+        self.dropped = 0                      # elements removed (top level of each skipped subtree)
+        self._skip = 0                        # depth inside a dropped element
+        self._pending: Optional[str] = None   # start tag not yet closed with ">" or "/>"
+        self._text: List[str] = []
+        self._keep: List[bool] = []           # per open element: keep whitespace-only text in it
+        self._out: List[str] = []
+
+        p = self._parser = expat.ParserCreate()
+        p.ordered_attributes = True
+        p.buffer_text = True
+        p.XmlDeclHandler = self._xml_decl
+        p.StartDoctypeDeclHandler = self._doctype
+        p.StartElementHandler = self._start
+        p.EndElementHandler = self._end
+        p.CharacterDataHandler = self._chars
+        p.ProcessingInstructionHandler = self._pi
+
+    # ------------------------------------------------------------- handlers
+    def _flush_text(self) -> None:
+        if self._text:
+            text = "".join(self._text)
+            self._text.clear()
+            if not text.isspace() or (self._keep and self._keep[-1]):
+                self._close_pending()
+                self._out.append(escape(text))
+
+    def _close_pending(self) -> None:
+        if self._pending is not None:
+            self._out.append(self._pending + ">")
+            self._pending = None
+
+    def _xml_decl(self, version, encoding, standalone) -> None:
+        sa = "" if standalone == -1 else f' standalone="{"yes" if standalone else "no"}"'
+        self._out.append(f'<?xml version="{version or "1.0"}" encoding="UTF-8"{sa}?>\n')
+
+    def _doctype(self, name, sysid, pubid, has_internal_subset) -> None:
+        ids = f' PUBLIC "{pubid}" "{sysid}"' if pubid else (f' SYSTEM "{sysid}"' if sysid else "")
+        self._out.append(f"<!DOCTYPE {name}{ids}>\n")
+
+    def _start(self, name: str, attrs: List[str]) -> None:
+        if self._skip:
+            self._skip += 1
+            return
+        self._flush_text()
+        local = _local(name)
+        if local in self.drop:
+            self._skip = 1
+            self.dropped += 1
+            return
+        self._close_pending()
+        keep = local in TEXT_ELEMENTS or (bool(self._keep) and self._keep[-1])
+        parts = [f"<{name}"]
+        for k in range(0, len(attrs), 2):
+            value = attrs[k + 1]
+            if attrs[k] == "xml:space":
+                keep = value == "preserve" or local in TEXT_ELEMENTS
+            if _needs_escape(value):
+                value = escape(value, _ATTR_ENTITIES)
+            parts.append(f' {attrs[k]}="{value}"')
+        self._pending = "".join(parts)
+        self._keep.append(keep)
+
+    def _end(self, name: str) -> None:
+        if self._skip:
+            self._skip -= 1
+            self._text.clear()
+            return
+        self._flush_text()
+        self._keep.pop()
+        if self._pending is not None:
+            self._out.append(self._pending + "/>")
+            self._pending = None
+        else:
+            self._out.append(f"</{name}>")
+
+    def _chars(self, data: str) -> None:
+        if not self._skip:
+            self._text.append(data)
+
+    def _pi(self, target: str, data: str) -> None:
+        if not self._skip:
+            self._flush_text()
+            self._close_pending()
+            self._out.append(f"<?{target} {data}?>")
+
+    # ------------------------------------------------------------------ API
+    def feed(self, data: Union[bytes, str], final: bool = False) -> None:
+        self._parser.Parse(data, final)
+        if self._out:
+            self.write("".join(self._out))
+            self._out.clear()
+
+    def close(self) -> None:
+        self.feed(b"", final=True)
+
+
+def filter_svg(chunks: Iterable[Union[bytes, str]], write: Callable[[str], object],
+               drop: Iterable[str]) -> int:
+    """Filter an SVG given as chunks; returns the number of dropped elements."""
+    f = SvgFilter(drop, write)
+    for chunk in chunks:
+        f.feed(chunk)
+    f.close()
+    return f.dropped
+
+
+def _slices(text: str, size: int = CHUNK) -> Iterable[str]:
+    return (text[k:k + size] for k in range(0, len(text), size))
+
+
+def filter_svg_string(svg: str, drop: Iterable[str]) -> str:
+    parts: List[str] = []
+    filter_svg(_slices(svg), parts.append, drop)
+    return "".join(parts)
+
+
+def filter_svg_to(svg: str, path: os.PathLike | str, drop: Iterable[str]) -> int:
+    """Filter an SVG held in memory (e.g. ``page.get_svg_image()``) straight into a file."""
+    with open(path, "w", encoding="utf-8") as out:
+        return filter_svg(_slices(svg), out.write, drop)
+
+
+def filter_svg_file(src: os.PathLike | str, dst: Optional[os.PathLike | str], drop: Iterable[str],
+                    chunk_size: int = CHUNK) -> int:
+    """Filter file ``src`` into ``dst`` chunk by chunk (``dst`` None: stdout)."""
+    with open(src, "rb") as fh:
+        chunks = iter(lambda: fh.read(chunk_size), b"")
+        if dst is None:
+            return filter_svg(chunks, sys.stdout.write, drop)
+        with open(dst, "w", encoding="utf-8") as out:
+            return filter_svg(chunks, out.write, drop)
@@ -0,0 +1,148 @@
+"""
+tagmatch.py — Match many component tags against the words of a page at once.
+
+``CountOneElement.py`` and ``P1.py`` used to look for a single hard-coded
+tag with ``text.lower() == "bp1"``, so counting a whole schedule meant one
+full run (render + extraction) per tag.  A ``TagSet`` holds all tags and
+matches every distinct text of a page once:
+
+  • exact tags   ``BP1``        — hash lookup (case-insensitive)
+  • prefixes     ``BP*``        — character trie, longest prefix wins
+  • patterns     ``re:^P\\d+$``  — regular expressions, first match wins
+
+An exact tag beats a prefix, a prefix beats a pattern.  Words are counted
+under the tag *as written in the list* (so ``BP*`` is one row that counts
+BP1, BP2, ...).  Because the lookup runs over a ``WordTable``'s vocabulary,
+the per-word work is a single array index.
+
+Tags come from the command line or a schedule file: ``.txt`` (one tag per
+line, ``#`` comments), ``.csv`` / ``.xlsx`` (column ``Tag``, ``Label`` or
+``Element``, else the first column).
+
+Usage
+-----
+    from tagmatch import TagSet, count_matrix
+    tags = TagSet(["BP1", "P*", r"re:^C\\d+[A-Z]?$"])
+    idx  = tags.assign(WordTable.from_page(page))     # tag index per word, -1 = none
+    per_page[page.number] = np.bincount(idx[idx >= 0], minlength=len(tags))
+    count_matrix(tags, per_page).to_excel("tag_counts.xlsx", index=False)
+"""
+from __future__ import annotations
+
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from wordtable import WordTable
+
+PREFIX_WILDCARD = "*"
+REGEX_PREFIX = "re:"
+_SCHEDULE_COLUMNS = ("tag", "label", "element")
+
+
+class _TrieNode:
+    __slots__ = ("children", "tag")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.tag: int = -1
+
+
+class TagSet:
+    """Ordered tag list with exact, prefix and regex entries (see module docstring)."""
+
+    def __init__(self, tags: Iterable[str]):
+        self.tags: List[str] = []
+        self._exact: Dict[str, int] = {}
+        self._trie = _TrieNode()
+        self._patterns: List[tuple] = []
+        seen = set()
+        for tag in tags:
+            tag = tag.strip()
+            if tag and tag not in seen:
+                seen.add(tag)
+                self._add(tag)
+
+    def _add(self, tag: str) -> None:
+        i = len(self.tags)
+        self.tags.append(tag)
+        if tag.startswith(REGEX_PREFIX):
+            self._patterns.append((re.compile(tag[len(REGEX_PREFIX):], re.IGNORECASE), i))
+        elif tag.endswith(PREFIX_WILDCARD):
+            node = self._trie
+            for ch in tag[:-1].lower():
+                node = node.children.setdefault(ch, _TrieNode())
+            if node.tag < 0:
+                node.tag = i
+        else:
+            self._exact.setdefault(tag.lower(), i)
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def match(self, text: str) -> int:
+        """Index of the tag ``text`` counts towards, -1 if none."""
+        key = text.strip().lower()
+        if not key:
+            return -1
+        hit = self._exact.get(key)
+        if hit is not None:
+            return hit
+        node, best = self._trie, self._trie.tag
+        for ch in key:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            if node.tag >= 0:
+                best = node.tag
+        if best >= 0:
+            return best
+        for pattern, i in self._patterns:
+            if pattern.search(text.strip()):
+                return i
+        return -1
+
+    def assign(self, table: WordTable) -> np.ndarray:
+        """Tag index of every word of ``table`` (-1 = no tag); one lookup per distinct text."""
+        lookup = np.fromiter((self.match(t) for t in table.vocab), dtype=np.int32, count=len(table.vocab))
+        return lookup[table.codes] if len(table) else np.empty(0, dtype=np.int32)
+
+
+def load_tags(path: Path | str) -> List[str]:
+    """Tag list from a schedule file (.txt, .csv or .xlsx/.xls)."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".csv", ".xlsx", ".xls"):
+        df = pd.read_csv(path, dtype=str) if suffix == ".csv" else pd.read_excel(path, dtype=str)
+        columns = {str(c).strip().lower(): c for c in df.columns}
+        col = next((columns[c] for c in _SCHEDULE_COLUMNS if c in columns), df.columns[0])
+        return [str(t).strip() for t in df[col].dropna() if str(t).strip()]
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [ln.strip() for ln in lines if ln.strip() and not ln.lstrip().startswith("#")]
+
+
+def resolve_tags(tags: Optional[Sequence[str]] = None, schedule: Optional[Path | str] = None,
+                 default: Sequence[str] = ()) -> TagSet:
+    """Tags from the command line and/or a schedule file, else ``default``."""
+    found = list(tags or [])
+    if schedule:
+        found += load_tags(schedule)
+    return TagSet(found or default)
+
+
+def count_matrix(tags: TagSet, page_counts: Dict[int, Sequence[int]]) -> pd.DataFrame:
+    """Tag × page count table: ``Tag``, one ``Page N`` column per page (1-based), ``Total``.
+
+    ``page_counts`` maps a 0-based page index to a per-tag count vector.
+    """
+    df = pd.DataFrame({"Tag": tags.tags})
+    total = np.zeros(len(tags), dtype=np.int64)
+    for i, counts in page_counts.items():
+        counts = np.asarray(counts, dtype=np.int64)
+        df[f"Page {i + 1}"] = counts
+        total += counts
+    df["Total"] = total
+    return df
@@ -0,0 +1,164 @@
+"""
+wordcache.py — Persistent cache for ``page.get_text("words")``.
+
+Word extraction is one of the slowest MuPDF calls on large vector drawings
+and the same sheets are counted again and again with different ROIs.  The
+words of a page are stored once as a compact columnar ``.npz`` file keyed by
+
+    sha256(file contents) + page number + extraction flags
+
+so repeat runs skip MuPDF text extraction entirely.  The cache directory is
+size-bounded with least-recently-used eviction (``lrucache.CacheDir``).
+
+Columns per entry: ``coords`` (N, 4) float64, ``block``/``line``/``word``
+int32, and the texts as one UTF-8 blob plus (N + 1) offsets.  ``load``
+returns exactly the tuples ``get_text("words")`` would; ``load_columns``
+returns the arrays themselves (used by ``wordtable.WordTable``).
+
+Configuration (environment):
+  PDFIT2_WORD_CACHE       cache directory, or "off" to disable
+                          (default: ~/.cache/pdfit2/words)
+  PDFIT2_WORD_CACHE_MB    size limit in MiB (default: 512)
+
+Usage
+-----
+    from wordcache import get_words
+    words = get_words(page)          # drop-in for page.get_text("words")
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from lrucache import CacheDir
+
+_CHUNK = 1 << 20
+
+Word = Tuple[float, float, float, float, str, int, int, int]
+
+# (resolved path, size, mtime_ns) -> digest; avoids re-hashing within one process
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_hash(path: os.PathLike | str) -> str:
+    """SHA-256 of the file contents (hex)."""
+    path = Path(path).resolve()
+    st = path.stat()
+    memo_key = (str(path), st.st_size, st.st_mtime_ns)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with path.open("rb") as fh:
+            for chunk in iter(lambda: fh.read(_CHUNK), b""):
+                h.update(chunk)
+        digest = _hash_memo[memo_key] = h.hexdigest()
+    return digest
+
+
+_COLUMNS = ("coords", "block", "line", "word", "text", "offsets")
+
+
+def _pack(words: List[Word]) -> Dict[str, np.ndarray]:
+    encoded = [w[4].encode("utf-8") for w in words]
+    offsets = np.zeros(len(words) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    ints = np.array([w[5:8] for w in words], dtype=np.int32).reshape(-1, 3)
+    return {
+        "coords": np.array([w[:4] for w in words], dtype=np.float64).reshape(-1, 4),
+        "block": ints[:, 0], "line": ints[:, 1], "word": ints[:, 2],
+        "text": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "offsets": offsets,
+    }
+
+
+def _unpack(data) -> List[Word]:
+    coords = data["coords"].tolist()
+    blob = data["text"].tobytes()
+    off = data["offsets"].tolist()
+    block, line, word = data["block"].tolist(), data["line"].tolist(), data["word"].tolist()
+    return [(c[0], c[1], c[2], c[3], blob[off[i]:off[i + 1]].decode("utf-8"),
+             block[i], line[i], word[i]) for i, c in enumerate(coords)]
+
+
+class WordCache(CacheDir):
+    """LRU-bounded directory of ``.npz`` word tables."""
+
+    SUFFIXES = (".npz",)
+    ENV = "PDFIT2_WORD_CACHE"
+    DEFAULT_DIR = Path.home() / ".cache" / "pdfit2" / "words"
+    DEFAULT_MB = 512
+
+    def _entry(self, digest: str, page_number: int, flags: Optional[int]) -> Path:
+        tag = "default" if flags is None else str(flags)
+        return self.directory / digest[:2] / f"{digest}_p{page_number}_f{tag}.npz"
+
+    def load_columns(self, digest: str, page_number: int,
+                     flags: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        path = self._entry(digest, page_number, flags)
+        try:
+            with np.load(path) as data:
+                columns = {name: data[name] for name in _COLUMNS}
+        except (OSError, ValueError, KeyError):
+            return None
+        self.touch(path)
+        return columns
+
+    def load(self, digest: str, page_number: int, flags: Optional[int] = None) -> Optional[List[Word]]:
+        columns = self.load_columns(digest, page_number, flags)
+        return None if columns is None else _unpack(columns)
+
+    def store(self, digest: str, page_number: int, flags: Optional[int], words: List[Word]) -> None:
+        self.store_columns(digest, page_number, flags, _pack(words))
+
+    def store_columns(self, digest: str, page_number: int, flags: Optional[int],
+                      columns: Dict[str, np.ndarray]) -> None:
+        self.write(self._entry(digest, page_number, flags),
+                   lambda fh: np.savez_compressed(fh, **columns))
+
+
+def default_cache() -> Optional[WordCache]:
+    """Cache configured by the environment, or None when disabled."""
+    return WordCache.from_env()
+
+
+def get_words(page: fitz.Page, flags: Optional[int] = None,
+              cache: Optional[WordCache] = None) -> List[Word]:
+    """Cached drop-in for ``page.get_text("words", flags=flags)``.
+
+    The cache is bypassed for documents without a file on disk and for
+    documents modified in memory (their words no longer match the file).
+    """
+    cache = cache or default_cache()
+    doc = page.parent
+    source = doc.name
+    if cache is None or not source or doc.is_dirty or not os.path.isfile(source):
+        return page.get_text("words", flags=flags)
+
+    digest = file_hash(source)
+    words = cache.load(digest, page.number, flags)
+    if words is None:
+        words = page.get_text("words", flags=flags)
+        cache.store(digest, page.number, flags, words)
+    return words
+
+
+def get_word_columns(page: fitz.Page, flags: Optional[int] = None,
+                     cache: Optional[WordCache] = None) -> Dict[str, np.ndarray]:
+    """Like ``get_words`` but returns the packed columns, skipping the tuples on a hit."""
+    cache = cache or default_cache()
+    doc = page.parent
+    source = doc.name
+    if cache is None or not source or doc.is_dirty or not os.path.isfile(source):
+        return _pack(page.get_text("words", flags=flags))
+
+    digest = file_hash(source)
+    columns = cache.load_columns(digest, page.number, flags)
+    if columns is None:
+        columns = _pack(page.get_text("words", flags=flags))
+        cache.store_columns(digest, page.number, flags, columns)
+    return columns
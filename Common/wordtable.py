@@ -0,0 +1,180 @@
+"""
+wordtable.py — Compact, array-backed store for the words of a page.
+
+``page.get_text("words")`` returns a list of 8-tuples; every tuple, its four
+floats and its string are separate Python objects (several hundred bytes per
+word), and every filter is a Python loop over them.  ``WordTable`` keeps the
+same information in columns:
+
+  coords   (N, 4) float32   x0, y0, x1, y1 (unrotated page coordinates)
+  codes    (N,)   int32     index into ``vocab`` — each distinct text once
+  block / line / word  int32   MuPDF numbering, as in the tuples
+  sizes    (N,)   float32   font size (only with ``font_sizes=True``, else NaN)
+
+which is about 20 bytes per word for coordinates and label, and turns the
+usual selections into array operations:
+
+  with_text(...)       exact labels (case-insensitive by default)
+  matching(pred)       labels for which ``pred(text)`` is true — evaluated
+                       once per distinct text, not once per word
+  in_rects(rects)      centre inside any ROI (same rule as ``roifilter``)
+  with_font_size(...)  font size range
+
+Every filter returns a new ``WordTable`` sharing the vocabulary.  Iterating
+a table yields ``get_text("words")``-style tuples, so it can be passed to
+``labeldedup.dedup`` and other tuple consumers unchanged.
+
+Usage
+-----
+    from wordtable import WordTable
+    table = WordTable.from_page(page).in_rects(pdf_rects)
+    for x0, y0, x1, y1 in table.with_text("bp1").coords.tolist():
+        ...
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from roifilter import assign_to_rois
+from wordcache import Word, get_word_columns
+
+_SPAN_CHUNK = 4096  # words per broadcast when assigning font sizes
+
+
+class WordTable:
+    """Columnar ``get_text("words")``; see the module docstring."""
+
+    __slots__ = ("coords", "codes", "vocab", "block", "line", "word", "sizes")
+
+    def __init__(self, coords: np.ndarray, codes: np.ndarray, vocab: List[str],
+                 block: np.ndarray, line: np.ndarray, word: np.ndarray,
+                 sizes: Optional[np.ndarray] = None):
+        self.coords = coords
+        self.codes = codes
+        self.vocab = vocab
+        self.block = block
+        self.line = line
+        self.word = word
+        self.sizes = np.full(len(codes), np.nan, dtype=np.float32) if sizes is None else sizes
+
+    # ------------------------------------------------------------------ build
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray]) -> "WordTable":
+        """Build from the packed columns of ``wordcache`` (texts as blob + offsets)."""
+        blob = columns["text"].tobytes()
+        off = columns["offsets"].tolist()
+        index: Dict[str, int] = {}
+        codes = np.fromiter(
+            (index.setdefault(blob[a:b].decode("utf-8"), len(index)) for a, b in zip(off, off[1:])),
+            dtype=np.int32, count=len(off) - 1)
+        return cls(np.asarray(columns["coords"], dtype=np.float32).reshape(-1, 4), codes, list(index),
+                   columns["block"].astype(np.int32), columns["line"].astype(np.int32),
+                   columns["word"].astype(np.int32))
+
+    @classmethod
+    def from_words(cls, words: Sequence[Sequence]) -> "WordTable":
+        index: Dict[str, int] = {}
+        codes = np.fromiter((index.setdefault(w[4], len(index)) for w in words),
+                            dtype=np.int32, count=len(words))
+        ints = np.array([w[5:8] for w in words], dtype=np.int32).reshape(-1, 3)
+        coords = np.array([w[:4] for w in words], dtype=np.float32).reshape(-1, 4)
+        return cls(coords, codes, list(index), ints[:, 0].copy(), ints[:, 1].copy(), ints[:, 2].copy())
+
+    @classmethod
+    def from_page(cls, page: fitz.Page, flags: Optional[int] = None,
+                  font_sizes: bool = False) -> "WordTable":
+        """Words of ``page`` (through the word cache); ``font_sizes`` also fills ``sizes``."""
+        table = cls.from_columns(get_word_columns(page, flags))
+        if font_sizes:
+            table.sizes = _span_sizes(page, table.coords, flags)
+        return table
+
+    # ----------------------------------------------------------------- access
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index) -> "WordTable":
+        """Rows selected by a boolean mask or an index array (vocabulary is shared)."""
+        return WordTable(self.coords[index], self.codes[index], self.vocab,
+                         self.block[index], self.line[index], self.word[index], self.sizes[index])
+
+    def __iter__(self) -> Iterator[Word]:
+        vocab = self.vocab
+        for c, code, b, l, w in zip(self.coords.tolist(), self.codes.tolist(),
+                                    self.block.tolist(), self.line.tolist(), self.word.tolist()):
+            yield (c[0], c[1], c[2], c[3], vocab[code], b, l, w)
+
+    @property
+    def texts(self) -> List[str]:
+        vocab = self.vocab
+        return [vocab[c] for c in self.codes.tolist()]
+
+    def centers(self) -> Tuple[np.ndarray, np.ndarray]:
+        return ((self.coords[:, 0] + self.coords[:, 2]) / 2,
+                (self.coords[:, 1] + self.coords[:, 3]) / 2)
+
+    def to_words(self) -> List[Word]:
+        return list(self)
+
+    # ---------------------------------------------------------------- filters
+    def codes_where(self, predicate: Callable[[str], bool]) -> np.ndarray:
+        """Vocabulary codes whose text satisfies ``predicate``."""
+        return np.array([i for i, t in enumerate(self.vocab) if predicate(t)], dtype=np.int32)
+
+    def matching(self, predicate: Callable[[str], bool]) -> "WordTable":
+        return self[np.isin(self.codes, self.codes_where(predicate))]
+
+    def with_text(self, *labels: str, ignore_case: bool = True) -> "WordTable":
+        if ignore_case:
+            wanted = {lbl.lower() for lbl in labels}
+            return self.matching(lambda t: t.lower() in wanted)
+        wanted = set(labels)
+        return self.matching(lambda t: t in wanted)
+
+    def in_rects(self, rects: Sequence[Sequence[float]]) -> "WordTable":
+        """Words whose centre lies inside any of ``rects``."""
+        return self[assign_to_rois(self.coords.astype(np.float64), rects) >= 0]
+
+    def with_font_size(self, min_size: float = 0.0, max_size: float = np.inf) -> "WordTable":
+        if np.isnan(self.sizes).all() and len(self):
+            raise ValueError("font sizes not loaded; use WordTable.from_page(page, font_sizes=True)")
+        return self[(self.sizes >= min_size) & (self.sizes <= max_size)]
+
+    # ----------------------------------------------------------------- groups
+    def text_lines(self) -> List[Tuple[float, float, str]]:
+        """``(x0, y0, text)`` per MuPDF text line, words joined by single spaces."""
+        if not len(self):
+            return []
+        order = np.lexsort((self.word, self.line, self.block))
+        key = self.block[order].astype(np.int64) << 32 | self.line[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+        texts = [self.vocab[c] for c in self.codes[order].tolist()]
+        x0 = np.minimum.reduceat(self.coords[order, 0], starts).tolist()
+        y0 = np.minimum.reduceat(self.coords[order, 1], starts).tolist()
+        ends = starts[1:].tolist() + [len(order)]
+        return [(x0[k], y0[k], " ".join(texts[a:b]))
+                for k, (a, b) in enumerate(zip(starts.tolist(), ends))]
+
+
+def _span_sizes(page: fitz.Page, coords: np.ndarray, flags: Optional[int]) -> np.ndarray:
+    """Font size of the text span containing each word's centre (NaN if none).
+
+    Words and ``dict`` lines are not numbered consistently by MuPDF, so the
+    spans are matched geometrically instead of by block/line number.
+    """
+    spans = [s for b in page.get_text("dict", flags=flags)["blocks"]
+             for l in b.get("lines", ()) for s in l["spans"]]
+    sizes = np.full(len(coords), np.nan, dtype=np.float32)
+    if not spans:
+        return sizes
+    span_sizes = np.array([s["size"] for s in spans], dtype=np.float32)
+    span_rects = [s["bbox"] for s in spans]
+    boxes = coords.astype(np.float64)
+    for start in range(0, len(boxes), _SPAN_CHUNK):
+        idx = assign_to_rois(boxes[start:start + _SPAN_CHUNK], span_rects)
+        hit = idx >= 0
+        sizes[start:start + _SPAN_CHUNK][hit] = span_sizes[idx[hit]]
+    return sizes
@@ -2,220 +2,213 @@ import fitz
 import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.widgets import RectangleSelector, Button
-from PIL import Image, ImageDraw, ImageFont
 import os
-import math
-import pandas as pd
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from labeldedup import center
+from livecount import CountSession
+from pagecount import count_pages, counts_table, parse_page_range, total_counts
+from preview import render_preview
+from roicover import mask_outside, subtract_rects
 
 # ------------------------- Parameter Setting -------------------------
 zoom = 2.0  # Preview zoom ratio
+PREVIEW_MAX_PIXELS = 25_000_000  # The preview zoom is lowered automatically above this many pixels (None = no limit)
 mat = fitz.Matrix(zoom, zoom)
 DEDUP_THRESHOLD = 5.0  # The center point distance threshold when removing duplicates, in PDF coordinates
+ASSEMBLE_LABELS = False  # Re-join tags that MuPDF splits into several words ("BP" "1" -> "BP1") before counting
+LIVE_TOP_LABELS = 8  # Number of labels listed in the running count under the page while selecting
+MASK_MODE = "redact"  # "redact" really removes content outside the selection; "overlay" only paints it white (much faster on heavy CAD pages)
 
 # ------------------------- Helper Functions -------------------------
-def center(coord):
-    """Calculate the coordinates of the center point of the rectangle, coord is (x0, y0, x1, y1)"""
-    x0, y0, x1, y1 = coord
-    return ((x0 + x1) / 2, (y0 + y1) / 2)
-
-def is_close(new_coord, existing_coords, threshold=DEDUP_THRESHOLD):
-    """
-    Determine whether the distance between the center point of new_coord and any center point in existing_coords is less than the threshold. 
-    If so, they are considered to be the same label and True is returned.
-    """
-    new_center = center(new_coord)
-    for coord in existing_coords:
-        existing_center = center(coord)
-        if math.hypot(new_center[0] - existing_center[0], new_center[1] - existing_center[1]) < threshold:
-            return True
-    return False
-
-def word_in_rect(word, rect):
-    """Determine whether the center point of word is within rect; the first four items of word are (x0, y0, x1, y1)"""
-    x0, y0, x1, y1 = word[:4]
-    cx = (x0 + x1) / 2
-    cy = (y0 + y1) / 2
-    return rect.contains(fitz.Point(cx, cy))
-
-def subtract_rect(base, sub):
-    """
-    Subtract the sub rectangle from the base rectangle, returning a list of the remainder (possibly 0 to 4 rectangles)
-    Both are fitz.Rect objects
-    """
-    result = []
+def select_regions(page):
+    """Show the page and let the user drag any number of regions; returns them as fitz.Rect in PDF coordinates
 
-    if not base.intersects(sub):
-        return [base]
-    inter = base & sub  
- 
-    if inter.y0 > base.y0:
-        result.append(fitz.Rect(base.x0, base.y0, base.x1, inter.y0))
-
-    if inter.y1 < base.y1:
-        result.append(fitz.Rect(base.x0, inter.y1, base.x1, base.y1))
-
-    if inter.x0 > base.x0:
-        result.append(fitz.Rect(base.x0, inter.y0, inter.x0, inter.y1))
-
-    if inter.x1 < base.x1:
-        result.append(fitz.Rect(inter.x1, inter.y0, base.x1, inter.y1))
-    return result
-
-def subtract_rects(full_rect, sub_rects):
-    """
-    Subtract multiple sub_rects (fitz.Rect in a list) from full_rect (fitz.Rect), returning a list of complement regions
+    The label count of the current selection is updated live on every mouse release: dragging the
+    handles of the last region moves/resizes it, Backspace/Delete removes the last region.
     """
-    covers = [full_rect]
-    for sub in sub_rects:
-        new_covers = []
-        for rect in covers:
-            new_covers.extend(subtract_rect(rect, sub))
-        covers = new_covers
-    return covers
-
-
-pdf_path = input("Please enter the PDF file path：").strip()
-if not os.path.exists(pdf_path):
-    print("The file does not exist!")
-    exit(1)
-
-doc = fitz.open(pdf_path)
-page = doc[0]  
-
-
-pix = page.get_pixmap(matrix=mat)
-img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-if pix.n == 4:
-    img = img[..., :3]  
-
-
-rects = []
-
-def onselect(eclick, erelease):
-    """Callback: Save the selection and draw the border when the user drags the selection"""
-    x1, y1 = eclick.xdata, eclick.ydata
-    x2, y2 = erelease.xdata, erelease.ydata
-    rect = {
-        'x_min': min(x1, x2),
-        'y_min': min(y1, y2),
-        'x_max': max(x1, x2),
-        'y_max': max(y1, y2)
-    }
-    rects.append(rect)
-    print("Add a selection:", rect)
-    ax.add_patch(plt.Rectangle((rect['x_min'], rect['y_min']),
-                               rect['x_max'] - rect['x_min'],
-                               rect['y_max'] - rect['y_min'],
-                               edgecolor='red', facecolor='none', lw=2))
-    plt.draw()
-
-def finish(event):
-    """Click the Finish button to end the selection."""
-    print("End the selection.")
-    plt.close()
-
-fig, ax = plt.subplots()
-plt.subplots_adjust(bottom=0.2)  
-ax.imshow(img)
-ax.set_title("Drag the mouse to select the area (you can select multiple areas), and click Finish to end the selection.")
-toggle_selector = RectangleSelector(ax, onselect, useblit=True,
-                                    button=[1],
-                                    minspanx=5, minspany=5,
-                                    spancoords='pixels', interactive=True)
-ax_button = plt.axes([0.4, 0.05, 0.2, 0.075])
-btn_finish = Button(ax_button, "Finish")
-btn_finish.on_clicked(finish)
-plt.show()
-
-if not rects:
-    print("No region is selected and the program exits.")
-    exit(0)
-
-# ------------------------- Area Transfer -------------------------
-# Convert image coordinates to PDF coordinates (divided by zoom factor)
-pdf_rects = []
-for r in rects:
-    x_min_pdf = r['x_min'] / zoom
-    y_min_pdf = r['y_min'] / zoom
-    x_max_pdf = r['x_max'] / zoom
-    y_max_pdf = r['y_max'] / zoom
-    pdf_rect = fitz.Rect(x_min_pdf, y_min_pdf, x_max_pdf, y_max_pdf)
-    pdf_rects.append(pdf_rect)
-    print("The converted PDF selection coordinates:", pdf_rect)
-
-# ------------------------- The converted PDF selection coordinates: -------------------------
-# Get all the words in the page, in the format (x0, y0, x1, y1, text, ...)
-words = page.get_text("words")
-
-
-dedup_occurrences = {}
-
-for word in words:
-    for rect in pdf_rects:
-        if word_in_rect(word, rect):
-            label = word[4].strip()
-            if label == "":
-                continue
-            if label not in dedup_occurrences:
-                dedup_occurrences[label] = []
-            coord = word[:4]
-            if not is_close(coord, dedup_occurrences[label], DEDUP_THRESHOLD):
-                dedup_occurrences[label].append(coord)
-                print(f"Label {label}，Original coordinates {coord}，Center{center(coord)}")
-            break  
-
-label_counts = {label: len(coords) for label, coords in dedup_occurrences.items()}
-print("Element counting Result：", label_counts)
-
-# ------------------------- Generate preview image-------------------------
-
-unique_labels = list(dedup_occurrences.keys())
-colors = {}
-cmap = plt.get_cmap("tab10")
-for i, label in enumerate(unique_labels):
-    colors[label] = cmap(i % 10) 
-
-pil_img = Image.fromarray(img)
-draw = ImageDraw.Draw(pil_img)
-try:
-    font = ImageFont.truetype("arial.ttf", 16)
-except IOError:
-    font = ImageFont.load_default()
-
-
-for label, boxes in dedup_occurrences.items():
-   
-    color = tuple(int(255 * x) for x in colors[label][:3])
-    for box in boxes:
-        x0 = box[0] * zoom
-        y0 = box[1] * zoom
-        x1 = box[2] * zoom
-        y1 = box[3] * zoom
-        draw.rectangle([x0, y0, x1, y1], outline=color, width=2)
-        draw.text((x0, y0), label, fill=color, font=font)
-
-preview_image_path = "count_preview.png" 
-pil_img.save(preview_image_path)
-print("The count preview is saved as:", preview_image_path)
-
-
-full_page = page.rect
-
-
-cover_rects = subtract_rects(full_page, pdf_rects)
-print("The area that needs to be covered (the complementary area)")
-for cr in cover_rects:
-    print(cr)
-
-for cr in cover_rects:
-    page.add_redact_annot(cr, fill=(1, 1, 1))
-page.apply_redactions()
-output_pdf = "output_covered.pdf"
-doc.save(output_pdf)
-print("A new PDF (covering the portion outside the selection) is saved as:", output_pdf)  # Covered PDF output
-
-# ------------------------- Excel  -------------------------
-df = pd.DataFrame(list(label_counts.items()), columns=["Element", "No."])
-excel_path = "label_counts.xlsx"
-df.to_excel(excel_path, index=False)
-print("The Excel table has been saved as:", excel_path)  #Excel Output
+    pix = page.get_pixmap(matrix=mat)
+    img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 4:
+        img = img[..., :3]
+
+    session = CountSession(page, DEDUP_THRESHOLD, ASSEMBLE_LABELS)
+    regions = []  # (roi id, patch) in drawing order
+    drag = {"edit": False}  # whether the current drag started on a handle of the selector's box
+
+    def show_counts():
+        """Refresh the running count shown under the page"""
+        counts = session.counts()
+        top = sorted(counts.items(), key=lambda kv: -kv[1])[:LIVE_TOP_LABELS]
+        summary = ", ".join(f"{label}: {n}" for label, n in top)
+        count_text.set_text(f"{len(regions)} region(s), {session.total()} labels  {summary}")
+        fig.canvas.draw_idle()
+
+    def on_handle(event):
+        """True if the press is on a handle of the box the selector shows (the last region).
+
+        Same rule as the selector itself uses (corner / edge handles within grab_range pixels,
+        the centre handle within twice that), taken from its public attributes only.
+        """
+        if not regions or not toggle_selector.get_visible() or event.x is None:
+            return False
+        grab = toggle_selector.grab_range
+        points = [(grab * 2, toggle_selector.center)]
+        for xs, ys in (toggle_selector.corners, toggle_selector.edge_centers):
+            points += [(grab, xy) for xy in zip(xs, ys)]
+        for reach, xy in points:
+            hx, hy = ax.transData.transform(xy)
+            if np.hypot(event.x - hx, event.y - hy) < reach:
+                return True
+        return False
+
+    def onpress(event):
+        """Remember where the drag starts: on a handle it moves/resizes the last region, elsewhere it draws a new one"""
+        if event.inaxes is ax and event.button == 1:
+            drag["edit"] = on_handle(event)
+
+    def onselect(eclick, erelease):
+        """Callback: Save the selection and draw the border when the user drags the selection"""
+        x1, y1 = eclick.xdata, eclick.ydata
+        x2, y2 = erelease.xdata, erelease.ydata
+        rect = {
+            'x_min': min(x1, x2),
+            'y_min': min(y1, y2),
+            'x_max': max(x1, x2),
+            'y_max': max(y1, y2)
+        }
+        pdf_rect = fitz.Rect(rect['x_min'] / zoom, rect['y_min'] / zoom, rect['x_max'] / zoom, rect['y_max'] / zoom)
+        # a handle of the interactive selector was dragged: the last region was moved or resized
+        if regions and drag["edit"]:
+            rid, patch = regions[-1]
+            session.move(rid, pdf_rect)
+            patch.set_bounds(rect['x_min'], rect['y_min'], rect['x_max'] - rect['x_min'], rect['y_max'] - rect['y_min'])
+            print("Move the last selection:", rect)
+        else:
+            patch = plt.Rectangle((rect['x_min'], rect['y_min']),
+                                  rect['x_max'] - rect['x_min'],
+                                  rect['y_max'] - rect['y_min'],
+                                  edgecolor='red', facecolor='none', lw=2)
+            ax.add_patch(patch)
+            regions.append((session.add(pdf_rect), patch))
+            print("Add a selection:", rect)
+        show_counts()
+
+    def onkey(event):
+        """Backspace / Delete removes the last selection"""
+        if event.key in ("backspace", "delete") and regions:
+            rid, patch = regions.pop()
+            session.remove(rid)
+            patch.remove()
+            # the selector's box (and its handles) follows the region that is now last
+            if regions:
+                x, y = regions[-1][1].get_xy()
+                toggle_selector.extents = (x, x + regions[-1][1].get_width(), y, y + regions[-1][1].get_height())
+            else:
+                toggle_selector.set_visible(False)
+            print("Remove the last selection.")
+            show_counts()
+
+    def finish(event):
+        """Click the Finish button to end the selection."""
+        print("End the selection.")
+        plt.close()
+
+    fig, ax = plt.subplots()
+    plt.subplots_adjust(bottom=0.2)
+    ax.imshow(img)
+    ax.set_title("Drag the mouse to select the area (you can select multiple areas), and click Finish to end the selection.")
+    count_text = fig.text(0.02, 0.13, "0 region(s), 0 labels", fontsize=9)
+    # connected before the selector, so it sees the press before the selector changes its box
+    fig.canvas.mpl_connect("button_press_event", onpress)
+    toggle_selector = RectangleSelector(ax, onselect, useblit=True,
+                                        button=[1],
+                                        minspanx=5, minspany=5,
+                                        spancoords='pixels', interactive=True)
+    fig.canvas.mpl_connect("key_press_event", onkey)
+    ax_button = plt.axes([0.4, 0.05, 0.2, 0.075])
+    btn_finish = Button(ax_button, "Finish")
+    btn_finish.on_clicked(finish)
+    plt.show()
+
+    # Selections are kept in PDF coordinates (image coordinates divided by zoom factor)
+    pdf_rects = session.rects
+    for pdf_rect in pdf_rects:
+        print("The converted PDF selection coordinates:", pdf_rect)
+    return pdf_rects
+
+
+def save_preview(page, occurrences, preview_image_path, verbose=True, rois=None):
+    """Render the selected area (the whole page if rois is None) and draw every counted label box, one colour per label"""
+    pil_img = render_preview(page, occurrences, rois, zoom, PREVIEW_MAX_PIXELS)
+    pil_img.save(preview_image_path)
+    if verbose:
+        print("The count preview is saved as:", preview_image_path)
+
+
+def cover_outside(doc, page_indices, pdf_rects, output_pdf, verbose=True, mode=MASK_MODE):
+    """White out everything outside pdf_rects on the given pages and save a copy"""
+    if verbose:
+        for i in page_indices:
+            print(f"Page {i + 1}: the area that needs to be covered (the complementary area)")
+            for cr in subtract_rects(doc[i].rect, pdf_rects):
+                print(cr)
+    mask_outside(doc, page_indices, pdf_rects, mode)
+    doc.save(output_pdf)
+    if verbose:
+        print("A new PDF (covering the portion outside the selection) is saved as:", output_pdf)  # Covered PDF output
+
+
+def main():
+    pdf_path = input("Please enter the PDF file path：").strip()
+    if not os.path.exists(pdf_path):
+        print("The file does not exist!")
+        exit(1)
+
+    doc = fitz.open(pdf_path)
+    page = doc[0]
+
+    pdf_rects = select_regions(page)
+    if not pdf_rects:
+        print("No region is selected and the program exits.")
+        exit(0)
+
+    # The selection made on the first page is applied to every counted page (same sheet template)
+    while True:
+        page_spec = input("Pages to count (e.g. 1-3,7 or all; blank = page 1)：").strip() or "1"
+        try:
+            page_indices = parse_page_range(page_spec, len(doc))
+            break
+        except ValueError as e:
+            print(f"Invalid page range ({e}), please try again.")
+    if not page_indices:
+        print("No valid page is selected and the program exits.")
+        exit(0)
+
+    # ------------------------- Counting -------------------------
+    results = count_pages(pdf_path, page_indices, pdf_rects, DEDUP_THRESHOLD, assemble=ASSEMBLE_LABELS)
+    for i, occurrences in results.items():
+        for label, coords in occurrences.items():
+            for coord in coords:
+                print(f"Page {i + 1}，Label {label}，Original coordinates {coord}，Center{center(coord)}")
+        print(f"Page {i + 1} counting Result：", {label: len(coords) for label, coords in occurrences.items()})
+
+    label_counts = total_counts(results)
+    print("Element counting Result：", label_counts)
+
+    # ------------------------- Preview / Cover -------------------------
+    first = page_indices[0]
+    save_preview(doc[first], results[first], "count_preview.png", rois=pdf_rects)
+    cover_outside(doc, page_indices, pdf_rects, "output_covered.pdf")
+
+    # ------------------------- Excel  -------------------------
+    df = counts_table(results, total_col="No.")
+    excel_path = "label_counts.xlsx"
+    df.to_excel(excel_path, index=False)
+    print("The Excel table has been saved as:", excel_path)  #Excel Output
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+batchcount.py — Headless batch version of Counting.py.
+
+Runs the same count → preview → cover → Excel steps as ``Counting.py`` for
+every PDF in a directory, without ``input()`` prompts or the matplotlib
+selector, so it can run on build servers.  Regions come from a JSON/CSV ROI
+file (see ``Common/roifile.py`` for the format), per file or per sheet
+template.  Files are processed in parallel worker processes; progress and
+per-file timings are printed as files finish and written to
+``batch_summary.csv``.  With ``--schedule`` the counts of all files are
+merged with the component schedule afterwards (see ``mergeschedule.py``).
+
+Outputs per PDF (in the output directory):
+  • <stem>_preview.png        — label boxes on the first counted page
+  • <stem>_covered.pdf        — everything outside the ROIs whited out
+  • <stem>_label_counts.xlsx  — per-page and total label counts
+  • schedule_totals.xlsx      — with --schedule: schedule-ordered totals + unmatched labels
+
+Usage
+-----
+```bash
+python batchcount.py drawings/ rois.json -o counted --pages all --jobs 8
+```
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import matplotlib
+matplotlib.use("Agg")  # no display on build servers; must precede Counting's pyplot import
+import fitz  # PyMuPDF
+import pandas as pd
+
+import Counting  # noqa: E402  (adds Common/ to sys.path)
+from pagecount import count_pages, counts_table, parse_page_range, total_counts
+from roicover import MASK_MODES
+from roifile import load_roi_file
+from schedule import COUNTS_SUFFIX, load_schedule, merge_schedule, read_counts, write_merged
+
+
+def process_pdf(pdf_path: str, rois: Sequence[Sequence[float]], out_dir: str,
+                page_spec: str = "1", threshold: float = Counting.DEDUP_THRESHOLD,
+                mask_mode: str = Counting.MASK_MODE, assemble: bool = Counting.ASSEMBLE_LABELS) -> Dict:
+    """Count → preview → cover → Excel for one PDF; returns a summary row."""
+    start = time.perf_counter()
+    pdf_path, out_dir = Path(pdf_path), Path(out_dir)
+    pdf_rects = [fitz.Rect(r) for r in rois]
+
+    with fitz.open(pdf_path) as doc:
+        page_indices = parse_page_range(page_spec, len(doc))
+        if not page_indices:
+            raise ValueError(f"no page of {pdf_path.name} matches {page_spec!r}")
+        # pages run sequentially here: the pool in run_batch() is already one process per file
+        results = count_pages(pdf_path, page_indices, pdf_rects, threshold, jobs=1, assemble=assemble)
+
+        first = page_indices[0]
+        Counting.save_preview(doc[first], results[first],
+                              out_dir / f"{pdf_path.stem}_preview.png", verbose=False, rois=pdf_rects)
+        Counting.cover_outside(doc, page_indices, pdf_rects,
+                               out_dir / f"{pdf_path.stem}_covered.pdf", verbose=False, mode=mask_mode)
+
+    counts_table(results, total_col="No.").to_excel(
+        out_dir / f"{pdf_path.stem}{COUNTS_SUFFIX}.xlsx", index=False)
+    totals = total_counts(results)
+    return {
+        "file": pdf_path.name,
+        "pages": len(page_indices),
+        "labels": len(totals),
+        "count": sum(totals.values()),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch(pdf_dir: Path, roi_file: Path, out_dir: Path, page_spec: str = "1",
+              jobs: Optional[int] = None, threshold: float = Counting.DEDUP_THRESHOLD,
+              mask_mode: str = Counting.MASK_MODE,
+              schedule_file: Optional[Path] = None,
+              assemble: bool = Counting.ASSEMBLE_LABELS) -> pd.DataFrame:
+    spec = load_roi_file(roi_file)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks: Dict[Path, List] = {}
+    for pdf in sorted(pdf_dir.glob("*.pdf")):
+        try:
+            rois = spec.rois_for(pdf)
+        except KeyError as e:   # entry names a template the ROI file does not define
+            print(f"[!] {pdf.name}: {e.args[0]} — skipped", file=sys.stderr)
+            continue
+        if not rois:
+            print(f"[!] no ROI for {pdf.name} — skipped", file=sys.stderr)
+            continue
+        tasks[pdf] = rois
+    if not tasks:
+        raise SystemExit(f"[!] nothing to do in {pdf_dir}")
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(tasks)))
+    rows = []
+    batch_start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(process_pdf, str(pdf), rois, str(out_dir), page_spec, threshold, mask_mode, assemble): pdf
+                   for pdf, rois in tasks.items()}
+        for done, fut in enumerate(as_completed(futures), 1):
+            pdf = futures[fut]
+            try:
+                row = fut.result()
+                print(f"[{done}/{len(tasks)}] {pdf.name}: {row['count']} labels "
+                      f"on {row['pages']} page(s) in {row['seconds']:.2f}s")
+            except Exception as e:  # keep going; report the file as failed
+                row = {"file": pdf.name, "error": str(e)}
+                print(f"[{done}/{len(tasks)}] {pdf.name}: FAILED — {e}", file=sys.stderr)
+            rows.append(row)
+
+    summary = pd.DataFrame(rows).sort_values("file", ignore_index=True)
+    summary.to_csv(out_dir / "batch_summary.csv", index=False)
+    print(f"\n✓ {len(tasks)} file(s) in {time.perf_counter() - batch_start:.2f}s "
+          f"with {jobs} worker(s) → {out_dir}")
+
+    if schedule_file is not None:
+        done = [out_dir / f"{Path(r['file']).stem}{COUNTS_SUFFIX}.xlsx" for r in rows if "error" not in r]
+        totals, unmatched = merge_schedule(load_schedule(schedule_file), read_counts(done))
+        write_merged(totals, unmatched, out_dir / "schedule_totals.xlsx")
+        print(f"✓ merged with {schedule_file.name}: {len(totals)} schedule item(s), "
+              f"{len(unmatched)} unmatched label(s)")
+    return summary
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Headless batch label counting driven by an ROI file.")
+    parser.add_argument("pdf_dir", help="Directory containing the PDFs to count")
+    parser.add_argument("roi_file", help="JSON or CSV file with the ROIs (PDF points)")
+    parser.add_argument("-o", "--output", default="batch_output", help="Output directory (default: batch_output)")
+    parser.add_argument("--pages", default="1", help="Pages to count, e.g. 1-3,7 or all (default: 1)")
+    parser.add_argument("-j", "--jobs", type=int, help="Parallel worker processes (default: CPU count)")
+    parser.add_argument("--threshold", type=float, default=Counting.DEDUP_THRESHOLD,
+                        help="De-duplication centre distance in PDF points")
+    parser.add_argument("--mask", choices=MASK_MODES, default=Counting.MASK_MODE,
+                        help="redact: remove content outside the ROIs; overlay: paint it white (fast)")
+    parser.add_argument("--assemble", action="store_true",
+                        help='Re-join tags split into several words ("BP" "1" -> "BP1") before counting')
+    parser.add_argument("--schedule", help="Component schedule .xlsx/.csv to merge the counts with")
+    args = parser.parse_args()
+
+    pdf_dir = Path(args.pdf_dir).expanduser().resolve()
+    if not pdf_dir.is_dir():
+        raise SystemExit(f"[!] Directory not found: {pdf_dir}")
+    roi_file = Path(args.roi_file).expanduser().resolve()
+    if not roi_file.is_file():
+        raise SystemExit(f"[!] ROI file not found: {roi_file}")
+
+    schedule_file = None
+    if args.schedule:
+        schedule_file = Path(args.schedule).expanduser().resolve()
+        if not schedule_file.is_file():
+            raise SystemExit(f"[!] Schedule not found: {schedule_file}")
+
+    run_batch(pdf_dir, roi_file, Path(args.output).expanduser().resolve(),
+              args.pages, args.jobs, args.threshold, args.mask, schedule_file, args.assemble)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+mergeschedule.py — Merge label counts of many drawings with the component schedule.
+
+Replaces the manual spreadsheet step after ``Counting.py`` /
+``batchcount.py``: all ``label_counts.xlsx`` files are joined against the
+schedule in one pass (see ``Common/schedule.py``).  The schedule is an
+.xlsx/.csv file, or a PDF sheet whose schedule table is read directly
+(``--page`` and optionally ``--rect`` to point at the table).
+
+Output workbook:
+  • Totals     — schedule rows in schedule order, one column per drawing, Total
+  • Unmatched  — counted labels that are not in the schedule
+
+Usage
+-----
+```bash
+python mergeschedule.py schedule.xlsx counted/*_label_counts.xlsx -o quantities.xlsx
+python mergeschedule.py S10.pdf --page 1 --rect 1750,760,2290,1140 counted/ --drop-zero
+```
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from schedule import (COUNTS_SUFFIX, load_schedule, merge_schedule, read_counts,  # noqa: E402
+                      schedule_from_page, write_merged)
+
+
+def _count_files(inputs: List[str]) -> List[Path]:
+    files = []
+    for item in inputs:
+        p = Path(item).expanduser()
+        if p.is_dir():
+            files += sorted(p.glob(f"*{COUNTS_SUFFIX}.xlsx"))
+        elif p.is_file():
+            files.append(p)
+        else:
+            print(f"[!] not found: {p}", file=sys.stderr)
+    return files
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Merge label counts with the component schedule.")
+    parser.add_argument("schedule", help="Schedule .xlsx/.csv, or a PDF sheet containing the schedule table")
+    parser.add_argument("counts", nargs="+", help="label_counts .xlsx files or directories containing them")
+    parser.add_argument("-o", "--output", default="schedule_totals.xlsx",
+                        help="Output workbook (default: schedule_totals.xlsx)")
+    parser.add_argument("--page", type=int, default=1, help="PDF schedule: 1-based page number (default: 1)")
+    parser.add_argument("--rect", help="PDF schedule: x0,y0,x1,y1 of the table in PDF points (default: whole page)")
+    parser.add_argument("--sheet", default=0, help="Excel schedule: sheet name or index (default: first)")
+    parser.add_argument("--drop-zero", action="store_true", help="Leave out schedule items with no count")
+    args = parser.parse_args()
+
+    source = Path(args.schedule).expanduser()
+    if not source.is_file():
+        raise SystemExit(f"[!] Schedule not found: {source}")
+    if source.suffix.lower() == ".pdf":
+        rect = [float(v) for v in args.rect.split(",")] if args.rect else None
+        with fitz.open(source) as doc:
+            schedule = schedule_from_page(doc[args.page - 1], rect)
+    else:
+        sheet = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+        schedule = load_schedule(source, sheet)
+    if schedule.empty:
+        raise SystemExit(f"[!] No schedule marks found in {source}")
+
+    files = _count_files(args.counts)
+    if not files:
+        raise SystemExit("[!] No label count files given")
+
+    totals, unmatched = merge_schedule(schedule, read_counts(files), args.drop_zero)
+    write_merged(totals, unmatched, args.output)
+    print(f"✓ {len(schedule)} schedule item(s) × {len(files)} drawing(s), "
+          f"{len(unmatched)} unmatched label(s) → {args.output}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,31 +1,139 @@
 import fitz
 import io
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 from PIL import Image
 
-def extract_images(pdf_path, output_folder="PDFIT2\ImageExtraction\ExtractedImages"):
-    import os
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from imageregistry import MANIFEST_NAME, ImageRegistry
+
+# Filters whose encoded stream is already a usable image file (no decode / re-encode)
+PASSTHROUGH = {"/DCTDecode": "jpg", "/JPXDecode": "jp2"}
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+DEFAULT_OUTPUT = os.path.join("PDFIT2", "ImageExtraction", "ExtractedImages")
+
+
+def _jpeg_components(data):
+    """Number of colour components in the JPEG frame header (1 = gray, 3 = RGB/YCbCr, 4 = CMYK), 0 if not found"""
+    pos = 2
+    while pos + 9 < len(data) and data[pos] == 0xFF:
+        marker = data[pos + 1]
+        if marker in SOF_MARKERS:
+            return data[pos + 9]
+        pos += 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+    return 0
+
+
+def raw_image(doc, img):
+    """(bytes, extension) when the encoded stream is itself a usable image file, else None.
+
+    JPEG only for gray / RGB; images with an SMask (transparency), a Decode
+    array or several filters, CMYK / Indexed colour spaces and JBIG2 (the
+    embedded stream lacks the file header and global segments) have to go
+    through a Pixmap.
+    """
+    xref, smask = img[0], img[1]
+    kind, filt = doc.xref_get_key(xref, "Filter")
+    ext = PASSTHROUGH.get(filt) if kind == "name" else None
+    if ext is None or smask or doc.xref_get_key(xref, "Decode")[0] != "null":
+        return None
+    data = doc.xref_stream_raw(xref)
+    if ext == "jpg":
+        cs_kind, cs = doc.xref_get_key(xref, "ColorSpace")
+        if cs_kind == "name" and cs not in ("/DeviceRGB", "/DeviceGray"):
+            return None
+        if cs_kind == "array" and not cs.startswith("[/ICCBased"):
+            return None
+        if _jpeg_components(data) not in (1, 3):
+            return None
+    elif not data.startswith(b"\x00\x00\x00\x0cjP"):
+        ext = "j2k"   # bare JPEG 2000 codestream (no JP2 file wrapper)
+    return data, ext
+
+
+def _save_png(doc, xref, image_path):
+    pix = fitz.Pixmap(doc, xref)
+
+    # CMYK etc. (more than 3 colour components, alpha not counted): PNG cannot store it, convert to RGB
+    if pix.n - pix.alpha > 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    pix.save(image_path)
+    pix = None
+
+
+# Process pool: every worker opens the PDF once and decodes / PNG-encodes the images that need converting
+_worker_doc = None
+
+
+def _init_worker(pdf_path):
+    global _worker_doc
+    _worker_doc = fitz.open(pdf_path)
+
+
+def _png_worker(xref, image_path):
+    _save_png(_worker_doc, xref, image_path)
+
+
+def extract_images(pdf_path, output_folder=DEFAULT_OUTPUT, raw=False, jobs=1):
+    """Extract every unique image of the PDF; ``jobs`` > 1 converts PNGs in that many processes (0 = CPU count)."""
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
-    
+
     doc = fitz.open(pdf_path)
+    registry = ImageRegistry(doc)
     image_count = 0
+    jobs = (os.cpu_count() or 1) if jobs == 0 else (jobs or 1)
+    pool = ProcessPoolExecutor(jobs, initializer=_init_worker, initargs=(str(pdf_path),)) if jobs > 1 else None
+    pending = []
 
     for page_number in range(len(doc)):
         page = doc[page_number]
         image_list = page.get_images(full=True)
         for image_index, img in enumerate(image_list):
             xref = img[0]
-   
-            pix = fitz.Pixmap(doc, xref)
-
-            if pix.n >= 5:
-                pix = fitz.Pixmap(fitz.csRGB, pix)
-            image_filename = os.path.join(output_folder, f"image_page{page_number+1}_{image_index+1}.png")
-            pix.save(image_filename)
-            pix = None
+
+            def save(xref=xref, img=img, page_number=page_number, image_index=image_index):
+                # raw mode: JPEG / JPEG 2000 written as they are, neither decoded nor re-compressed
+                stream = raw_image(doc, img) if raw else None
+                if stream is not None:
+                    data, ext = stream
+                    image_filename = f"image_page{page_number+1}_{image_index+1}.{ext}"
+                    with open(os.path.join(output_folder, image_filename), "wb") as fh:
+                        fh.write(data)
+                    return image_filename
+
+                image_filename = f"image_page{page_number+1}_{image_index+1}.png"
+                image_path = os.path.join(output_folder, image_filename)
+                if pool is None:
+                    _save_png(doc, xref, image_path)
+                else:
+                    pending.append(pool.submit(_png_worker, xref, image_path))
+                return image_filename
+
+            # the same image (same xref or same content) is decoded and saved once per document
+            registry.add(page_number + 1, img, save)
             image_count += 1
-    print(f"Number of Images: {image_count} 。")
+
+    if pool is not None:
+        for fut in pending:
+            fut.result()
+        pool.shutdown()
+
+    # page → image files table
+    registry.write_manifest(os.path.join(output_folder, MANIFEST_NAME))
+    passed = sum(not name.endswith(".png") for name in registry.images)
+    print(f"Number of Images: {image_count} ({len(registry.images)} unique, {passed} written as is) 。")
 
 if __name__ == "__main__":
-    pdf_file = "3.pdf"  
-    extract_images(pdf_file)
+    parser = argparse.ArgumentParser(description="Extract the images of a PDF, each unique image once.")
+    parser.add_argument("pdf", nargs="?", default="3.pdf", help="PDF path (default: 3.pdf)")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT, help=f"Output folder (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--raw", action="store_true",
+                        help="Write JPEG / JPEG 2000 streams as they are; convert only the rest to PNG")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Processes for PNG conversion (default: 1, 0 = all cores)")
+    args = parser.parse_args()
+    extract_images(args.pdf, args.output, args.raw, args.jobs)
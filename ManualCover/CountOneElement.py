@@ -1,30 +1,29 @@
-import fitz  
+import fitz
 from PIL import Image, ImageDraw, ImageFont
+import argparse
 import os
-import math
+import sys
+from pathlib import Path
 
-def center(coord):
+import numpy as np
 
-    x0, y0, x1, y1 = coord
-    return ((x0 + x1) / 2, (y0 + y1) / 2)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from labeldedup import LabelDeduplicator, center
+from tagmatch import count_matrix, resolve_tags
+from wordtable import WordTable
 
-def is_close(new_coord, existing_coords, threshold=5.0):
+DEFAULT_TAGS = ["bp1"]
 
-    new_center = center(new_coord)
-    for coord in existing_coords:
-        existing_center = center(coord)
-        dist = math.hypot(new_center[0] - existing_center[0], new_center[1] - existing_center[1])
-        if dist < threshold:
-            return True
-    return False
 
-def visualize_text_boxes(pdf_path, output_folder="Example2_bp1", threshold=5.0):
+def visualize_text_boxes(pdf_path, output_folder="Example2_bp1", threshold=5.0, tags=None):
+    """Count every tag of ``tags`` (a TagSet, default bp1) on every page in one pass."""
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
+    tags = tags or resolve_tags(default=DEFAULT_TAGS)
     doc = fitz.open(pdf_path)
-    total_p1_count = 0  
-    
+    per_page = {}
+
 
     try:
         font = ImageFont.truetype("arial.ttf", size=20)
@@ -33,41 +32,57 @@ def visualize_text_boxes(pdf_path, output_folder="Example2_bp1", threshold=5.0):
 
     for page_number in range(len(doc)):
         page = doc[page_number]
-        
+
 
         pix = page.get_pixmap()
         mode = "RGB" if pix.alpha == 0 else "RGBA"
         img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
         draw = ImageDraw.Draw(img)
-        
-        seen_coords = [] 
-        page_p1_count = 0   
-   
-        words = page.get_text("words")
-        for word in words:
-            x0, y0, x1, y1 = word[:4]
-            text = word[4] if len(word) >= 5 else ""
-  
-            if text.lower() == "bp1":
-                coord = (x0, y0, x1, y1)
-         
-                print(f"Page {page_number+1} - Found P1 at raw coordinates: {coord}, center: {center(coord)}")
-           
-                if not is_close(coord, seen_coords, threshold):
-                    seen_coords.append(coord)
-                    draw.rectangle((x0, y0, x1, y1), outline="red", width=2)
-                    page_p1_count += 1
-        
-        total_p1_count += page_p1_count
-
-        draw.text((10, 10), f"P1 count: {page_p1_count}", fill="red", font=font)
-        
+
+        seen = LabelDeduplicator(threshold)   # one grid per tag
+
+        words = WordTable.from_page(page)
+        tag_idx = tags.assign(words)
+        hits = np.flatnonzero(tag_idx >= 0)
+        for i, (x0, y0, x1, y1) in zip(hits.tolist(), words.coords[hits].tolist()):
+            tag = tags.tags[tag_idx[i]]
+            coord = (x0, y0, x1, y1)
+
+            print(f"Page {page_number+1} - Found {tag} at raw coordinates: {coord}, center: {center(coord)}")
+
+            if seen.add(tag, coord):
+                draw.rectangle((x0, y0, x1, y1), outline="red", width=2)
+
+        counts = seen.counts()
+        per_page[page_number] = [counts.get(t, 0) for t in tags.tags]
+        page_count = sum(per_page[page_number])
+
+        draw.text((10, 10), f"Tag count: {page_count}", fill="red", font=font)
+
         output_path = os.path.join(output_folder, f"page_{page_number+1}.png")
         img.save(output_path)
-        print(f"Saved: {output_path} (Unique P1 count: {page_p1_count})")
-    
-    print(f"\nTotal unique P1 count in PDF: {total_p1_count}")
+        print(f"Saved: {output_path} (Unique tag count: {page_count})")
+
+    table = count_matrix(tags, per_page)
+    table_path = os.path.join(output_folder, "tag_counts.xlsx")
+    table.to_excel(table_path, index=False)
+    print(f"\n{table.to_string(index=False)}")
+    print(f"\nTotal unique tag count in PDF: {int(table['Total'].sum())} → {table_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count one or more tags on every page in a single pass.")
+    parser.add_argument("pdf", nargs="?", default="output_2.pdf", help="PDF path (default: output_2.pdf)")
+    parser.add_argument("-t", "--tags", nargs="+",
+                        help="Tags to count: exact (BP1), prefix (BP*) or regex (re:^P\\d+$); default bp1")
+    parser.add_argument("-s", "--schedule", help="Schedule file with the tags (.txt/.csv/.xlsx)")
+    parser.add_argument("-o", "--output", default="Example2_bp1", help="Output folder (default: Example2_bp1)")
+    parser.add_argument("--threshold", type=float, default=5.0, help="De-duplication centre distance in PDF points")
+    args = parser.parse_args()
+
+    tags = resolve_tags(args.tags, args.schedule, DEFAULT_TAGS)
+    visualize_text_boxes(args.pdf, args.output, args.threshold, tags)
+
 
 if __name__ == "__main__":
-    pdf_file = "output_2.pdf"  
-    visualize_text_boxes(pdf_file)
+    main()
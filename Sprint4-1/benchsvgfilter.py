@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+benchsvgfilter.py — Vector-layer filtering: streaming vs. tree-based.
+
+For each page the SVG from ``page.get_svg_image`` is cleaned of
+``<image>``/``<text>`` by
+
+  • stream   — ``svgstream`` (expat, one pass), what ``layerexport`` uses
+  • bs4      — the previous ``layerexport`` path: BeautifulSoup + ``prettify``
+               (only when beautifulsoup4 is installed)
+  • etree    — ElementTree tree, remove, ``tostring`` (tree baseline without bs4)
+
+and the time, the peak Python memory (tracemalloc) and the output size are
+reported, together with the number of ``<path>`` elements kept — it must
+be the same for every method.
+
+Usage
+-----
+```bash
+python benchsvgfilter.py                 # 1.pdf page 1
+python benchsvgfilter.py 3.pdf --pages all
+```
+"""
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from pagecount import parse_page_range  # noqa: E402
+from svgstream import filter_svg_string  # noqa: E402
+
+DROP = ("image", "text")
+SVG_NS = "{http://www.w3.org/2000/svg}"
+
+
+def stream_filter(svg: str) -> str:
+    return filter_svg_string(svg, DROP)
+
+
+def bs4_filter(svg: str) -> str:
+    from bs4 import BeautifulSoup, FeatureNotFound  # type: ignore
+    try:
+        soup = BeautifulSoup(svg, "xml")
+    except FeatureNotFound:
+        soup = BeautifulSoup(svg, "html.parser")
+    for tag in soup.find_all(list(DROP)):
+        tag.decompose()
+    return soup.prettify()
+
+
+def etree_filter(svg: str) -> str:
+    root = ET.fromstring(svg)
+    drop = {SVG_NS + t for t in DROP}
+    for parent in list(root.iter()):
+        for child in [c for c in parent if c.tag in drop]:
+            parent.remove(child)
+    return ET.tostring(root, encoding="unicode")
+
+
+def measure(fn: Callable[[str], str], svg: str) -> Tuple[float, int, str]:
+    """Seconds and peak traced memory, from separate runs (tracemalloc slows allocation down)."""
+    start = time.perf_counter()
+    out = fn(svg)
+    seconds = time.perf_counter() - start
+    del out
+    tracemalloc.start()
+    out = fn(svg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, out
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the vector-layer SVG filter.")
+    parser.add_argument("pdf", nargs="?", type=Path, default=Path(__file__).resolve().parent / "1.pdf",
+                        help="PDF to take the pages from (default: 1.pdf next to this script)")
+    parser.add_argument("--pages", default="1", help="Pages, e.g. 1-3 or all (default: 1)")
+    args = parser.parse_args()
+
+    methods: Dict[str, Callable[[str], str]] = {"stream": stream_filter}
+    try:
+        import bs4  # noqa: F401
+        methods["bs4"] = bs4_filter
+    except ImportError:
+        print("[!] beautifulsoup4 not installed — previous path (bs4) skipped", file=sys.stderr)
+    methods["etree"] = etree_filter
+
+    totals: Dict[str, List[float]] = {name: [0.0, 0, 0] for name in methods}
+    with fitz.open(args.pdf) as doc:
+        for i in parse_page_range(args.pages, len(doc)):
+            svg = doc[i].get_svg_image(text_as_path=False)
+            print(f"page {i + 1}: SVG {len(svg.encode()) / 1e6:.1f} MB")
+            for name, fn in methods.items():
+                seconds, peak, out = measure(fn, svg)
+                paths = len(re.findall(r"<(?:\w+:)?path[\s/>]", out))
+                left = len(re.findall(r"<(?:\w+:)?(?:image|text)[\s/>]", out))
+                size = len(out.encode())
+                print(f"  {name:<7} {seconds:7.2f} s  peak {peak / 1e6:7.1f} MB  "
+                      f"out {size / 1e6:6.1f} MB  paths {paths}  image/text left {left}")
+                totals[name][0] += seconds
+                totals[name][1] = max(totals[name][1], peak)
+                totals[name][2] += size
+
+    print("\ntotal")
+    for name, (seconds, peak, size) in totals.items():
+        print(f"  {name:<7} {seconds:7.2f} s  peak {peak / 1e6:7.1f} MB  out {size / 1e6:6.1f} MB")
+
+
+if __name__ == "__main__":
+    cli()
@@ -8,6 +8,17 @@ svg_circle_remover.py — Delete all <circle> elements from an SVG file.
 * New `-p/--print` to stream cleaned SVG to stdout (no file written).
 * Improved file-type guard & binary read remain.
 
+**v5 — Streaming, constant memory**
+-----------------------------------
+* The SVG is read in chunks and filtered by an incremental expat parser
+  (Common/svgstream.py); output is written as it is produced, so memory
+  stays flat even for the multi-hundred-MB SVGs of A0 sheets — no
+  BeautifulSoup / ElementTree tree, no recursion.
+* `-p` streams to stdout chunk by chunk; `-i` writes a temporary file next
+  to the SVG and replaces the original only when the pass succeeded.
+* Output is compact (no `prettify()` re-indentation); beautifulsoup4 is
+  no longer needed.
+
 Usage Examples
 --------------
     # Interactive, default writes my.svg -> my_nocircle.svg
@@ -25,50 +36,46 @@ Usage Examples
 from __future__ import annotations
 
 import argparse
+import os
 import sys
+import tempfile
 from pathlib import Path
-import xml.etree.ElementTree as ET
+from typing import List, Optional
 
-# ---------------------------------------------------------------------------
-# Optional dependency: BeautifulSoup
-# ---------------------------------------------------------------------------
-try:
-    from bs4 import BeautifulSoup, FeatureNotFound  # type: ignore
-    _HAS_BS4 = True
-except ImportError:
-    _HAS_BS4 = False
-    print("[!] beautifulsoup4 not found — falling back to xml.etree (slower)", file=sys.stderr)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from svgstream import CHUNK, filter_svg, filter_svg_file  # noqa: E402
+
+DROP = ("circle",)
 
 # ---------------------------------------------------------------------------
 # Helper functions
 # ---------------------------------------------------------------------------
 
-def _remove_circles_bs4(svg_bytes: bytes) -> str:
+def remove_circles(src: Path, dst: Optional[Path], chunk_size: int = CHUNK) -> int:
+    """Stream ``src`` into ``dst`` (None: stdout) without circles; returns the number removed."""
+    return filter_svg_file(src, dst, DROP, chunk_size)
+
+
+def remove_circles_inplace(svg_path: Path, chunk_size: int = CHUNK) -> int:
+    # the source is still being read while the output is written, so go
+    # through a temporary file in the same directory and swap at the end
+    fd, tmp = tempfile.mkstemp(dir=svg_path.parent, suffix=".svg.tmp")
+    os.close(fd)
     try:
-        soup = BeautifulSoup(svg_bytes, "xml")
-    except (FeatureNotFound, Exception):
-        soup = BeautifulSoup(svg_bytes, "html.parser")
-    for c in soup.find_all("circle"):
-        c.decompose()
-    return soup.prettify()
-
-
-def _remove_circles_etree(svg_bytes: bytes) -> str:
-    root = ET.fromstring(svg_bytes)
-    ns = "{http://www.w3.org/2000/svg}"
-    def traverse(parent):
-        for child in list(parent):
-            if child.tag == f"{ns}circle":
-                parent.remove(child)
-            else:
-                traverse(child)
-    traverse(root)
-    return ET.tostring(root, encoding="unicode")
+        removed = remove_circles(svg_path, Path(tmp), chunk_size)
+        os.replace(tmp, svg_path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return removed
 
 
 def clean_svg(svg_path: Path) -> str:
-    svg_bytes = svg_path.read_bytes()
-    return (_remove_circles_bs4(svg_bytes) if _HAS_BS4 else _remove_circles_etree(svg_bytes))
+    """Cleaned SVG as a string (holds the output in memory; prefer ``remove_circles`` for big files)."""
+    parts: List[str] = []
+    with open(svg_path, "rb") as fh:
+        filter_svg(iter(lambda: fh.read(CHUNK), b""), parts.append, DROP)
+    return "".join(parts)
 
 # ---------------------------------------------------------------------------
 # CLI entry
@@ -80,6 +87,8 @@ def cli() -> None:
     parser.add_argument("-i", "--inplace", action="store_true", help="Edit the SVG in-place (overwrite)")
     parser.add_argument("-o", "--output", help="Write cleaned SVG to this file (ignored with -i)")
     parser.add_argument("-p", "--print", action="store_true", help="Print cleaned SVG to stdout instead of writing file")
+    parser.add_argument("--chunk-kb", type=int, default=CHUNK >> 10,
+                        help=f"Read size in KiB (default: {CHUNK >> 10})")
     args = parser.parse_args()
 
     svg_path = Path((args.svg or input("Input SVG file path > ").strip().strip('"'))).expanduser().resolve()
@@ -88,19 +97,25 @@ def cli() -> None:
     if svg_path.suffix.lower() != ".svg":
         print("[!] Warning: provided file does not appear to be an SVG.", file=sys.stderr)
 
-    cleaned_svg = clean_svg(svg_path)
+    chunk_size = args.chunk_kb << 10
 
     # Handle output destinations
     if args.print:
-        print(cleaned_svg)
+        sys.stdout.reconfigure(encoding="utf-8")
+        remove_circles(svg_path, None, chunk_size)
+        sys.stdout.write("\n")
         return
 
     if args.inplace:
         out_path = svg_path
+        removed = remove_circles_inplace(svg_path, chunk_size)
     else:
         out_path = Path(args.output) if args.output else svg_path.with_stem(svg_path.stem + "_nocircle")
-    out_path.write_text(cleaned_svg, encoding="utf-8")
-    print(f"✓ Circles removed → {out_path}")
+        if out_path.resolve() == svg_path:
+            removed = remove_circles_inplace(svg_path, chunk_size)
+        else:
+            removed = remove_circles(svg_path, out_path, chunk_size)
+    print(f"✓ {removed} circle(s) removed → {out_path}")
 
 if __name__ == "__main__":
     cli()
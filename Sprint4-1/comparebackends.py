@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+comparebackends.py — Latency and box agreement of the detector backends.
+
+Renders the sample sheets once (``newPredict.render_page``), runs every
+backend of ``cpubackend`` on the same page images and reports per backend:
+
+  • mean / median detection time per page (after one warm-up call)
+  • speed-up against the first backend
+  • agreement with the first backend's boxes: boxes matched one-to-one by
+    IoU (greedy, best first), share of reference boxes matched at
+    IoU ≥ 0.5, mean IoU of those matches, pages whose box count differs
+
+Usage
+-----
+```bash
+python comparebackends.py                              # 1.pdf and 3.pdf next to this script, page 1
+python comparebackends.py 1.pdf 3.pdf --pages all --backends torch onnx onnx-int8 --repeat 3
+```
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import fitz  # PyMuPDF
+
+from cpubackend import BACKENDS, load_detector
+from newPredict import RENDER_ZOOM, detect_regions, parse_page_range, render_page
+
+HERE = Path(__file__).resolve().parent
+SAMPLES = (HERE / "1.pdf", HERE / "3.pdf")
+MATCH_IOU = 0.5
+
+Box = Tuple[float, float, float, float]
+
+
+def box_iou(a: Box, b: Box) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
+
+
+def match_boxes(ref: Sequence[Box], other: Sequence[Box]) -> List[float]:
+    """IoU of each one-to-one match between ``ref`` and ``other``, best pairs first."""
+    pairs = sorted(((box_iou(a, b), i, j) for i, a in enumerate(ref) for j, b in enumerate(other)),
+                   reverse=True)
+    used_ref, used_other, ious = set(), set(), []
+    for iou, i, j in pairs:
+        if iou <= 0:
+            break
+        if i not in used_ref and j not in used_other:
+            used_ref.add(i)
+            used_other.add(j)
+            ious.append(iou)
+    return ious
+
+
+def time_backend(yolo, images, repeat: int) -> Tuple[List[float], List[List[Box]]]:
+    """Seconds per page (best of ``repeat``) and the boxes of each page."""
+    detect_regions(yolo, images[:1])                 # warm-up: lazy init, allocator
+    seconds, boxes = [], []
+    for img in images:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            (_, found), = detect_regions(yolo, [img])
+            best = min(best, time.perf_counter() - start)
+        seconds.append(best)
+        boxes.append(found)
+    return seconds, boxes
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Compare detector backends on sample sheets.")
+    parser.add_argument("pdfs", nargs="*", type=Path, default=list(SAMPLES),
+                        help="Sample PDFs (default: 1.pdf and 3.pdf next to this script)")
+    parser.add_argument("--pages", default="1", help="Pages per PDF, e.g. 1-3 or all (default: 1)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="Backends to run; the first one is the reference (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per page, best is kept (default: 1)")
+    parser.add_argument("--threads", type=int, help="ONNX Runtime intra-op threads (default: all cores)")
+    args = parser.parse_args()
+
+    images = []
+    for pdf in args.pdfs:
+        if not pdf.is_file():
+            sys.exit(f"[!] PDF not found: {pdf}")
+        with fitz.open(pdf) as doc:
+            pages = parse_page_range(args.pages, len(doc))
+        images += [render_page(pdf, i, RENDER_ZOOM).image for i in pages]
+    print(f"{len(images)} page image(s) from {len(args.pdfs)} PDF(s)")
+
+    runs: Dict[str, Tuple[List[float], List[List[Box]]]] = {}
+    for backend in args.backends:
+        start = time.perf_counter()
+        yolo = load_detector(backend, threads=args.threads)
+        print(f"{backend}: loaded in {time.perf_counter() - start:.1f}s")
+        runs[backend] = time_backend(yolo, images, args.repeat)
+        del yolo
+
+    ref_name = args.backends[0]
+    ref_seconds, ref_boxes = runs[ref_name]
+    n_ref = sum(len(b) for b in ref_boxes)
+    print(f"\n{'backend':<10} {'mean ms':>8} {'median ms':>10} {'speed-up':>9} "
+          f"{'matched':>8} {'mean IoU':>9} {'count ≠':>8}")
+    for backend, (seconds, boxes) in runs.items():
+        ious = [iou for r, o in zip(ref_boxes, boxes) for iou in match_boxes(r, o)]
+        good = [iou for iou in ious if iou >= MATCH_IOU]
+        differ = sum(len(r) != len(o) for r, o in zip(ref_boxes, boxes))
+        matched = f"{len(good) / n_ref:.1%}" if n_ref else "-"
+        mean_iou = f"{statistics.fmean(good):.3f}" if good else "-"
+        print(f"{backend:<10} {statistics.fmean(seconds) * 1e3:>8.1f} {statistics.median(seconds) * 1e3:>10.1f} "
+              f"{statistics.fmean(ref_seconds) / statistics.fmean(seconds):>8.2f}× "
+              f"{matched:>8} {mean_iou:>9} {differ:>8}")
+    print(f"(reference: {ref_name}, {n_ref} box(es); matched = share of reference boxes at IoU ≥ {MATCH_IOU})")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,136 @@
+"""
+cpubackend.py — Run the YOLO region detector on ONNX Runtime (CPU).
+
+The counting machines have no GPU and ``yolo.YOLO`` runs its torch network
+eagerly on the CPU.  ``load_detector(backend)`` constructs the usual
+``YOLO()`` and, for the ONNX backends, replaces its network with an ONNX
+Runtime session:
+
+  torch       the model as it is
+  onnx        network exported once to ``<weights>.onnx`` and run by ONNX Runtime
+  onnx-int8   the same with dynamically quantised int8 weights (``<weights>.int8.onnx``)
+
+Only ``yolo.net`` is swapped.  Letterboxing, box decoding, NMS and drawing
+stay in ``yolo.YOLO``, so ``detect_image`` returns the same
+``(image, coord_raw)`` as before.  Exported files sit next to the weights
+and are rebuilt when the weights are newer.
+
+Needs ``pip install onnx onnxruntime`` (exporting also needs torch, which
+``yolo.YOLO`` imports anyway).
+
+Usage
+-----
+    from cpubackend import load_detector
+    yolo = load_detector("onnx-int8")
+    r_img, coord_raw = yolo.detect_image(image, crop=True, count=False)
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_OPSET = 12
+
+
+class OnnxNet:
+    """Stands in for ``yolo.net``: torch tensor in, torch tensor(s) out, computed by ONNX Runtime."""
+
+    def __init__(self, path: os.PathLike | str, threads: Optional[int] = None):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            opts.intra_op_num_threads = threads
+        self.path = Path(path)
+        self.session = ort.InferenceSession(str(path), opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        self.multi_output = len(self.session.get_outputs()) > 1
+
+    def __call__(self, images):
+        import torch
+
+        feed = {self.input_name: images.detach().cpu().numpy().astype(np.float32, copy=False)}
+        outputs = [torch.from_numpy(o) for o in self.session.run(None, feed)]
+        return outputs if self.multi_output else outputs[0]
+
+    # the parts of the torch.nn.Module API yolo.YOLO calls on its network
+    def eval(self) -> "OnnxNet":
+        return self
+
+    def cpu(self) -> "OnnxNet":
+        return self
+
+
+def _replace(path: Path, write) -> None:
+    # write-then-rename so a half-written model is never picked up
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=path.suffix)
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _stale(target: Path, source: Path) -> bool:
+    return not target.is_file() or target.stat().st_mtime < source.stat().st_mtime
+
+
+def export_onnx(yolo, path: os.PathLike | str, opset: int = ONNX_OPSET) -> Path:
+    """Export ``yolo.net`` at its input size (batch axis dynamic) to ``path``."""
+    import torch
+
+    path = Path(path)
+    net = getattr(yolo.net, "module", yolo.net)   # unwrap DataParallel
+    net = net.cpu().eval()
+    h, w = yolo.input_shape
+    dummy = torch.zeros(1, 3, h, w)
+    with torch.no_grad():
+        _replace(path, lambda tmp: torch.onnx.export(
+            net, dummy, tmp, opset_version=opset, input_names=["images"],
+            dynamic_axes={"images": {0: "batch"}}))
+    return path
+
+
+def quantize_int8(source: os.PathLike | str, path: os.PathLike | str) -> Path:
+    """Dynamic int8 quantisation of the weights (no calibration images needed)."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = Path(path)
+    _replace(path, lambda tmp: quantize_dynamic(str(source), tmp, weight_type=QuantType.QUInt8))
+    return path
+
+
+def load_detector(backend: str = "torch", threads: Optional[int] = None, **yolo_kwargs):
+    """``YOLO(**yolo_kwargs)`` running on ``backend`` (one of ``BACKENDS``)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    from yolo import YOLO
+
+    yolo = YOLO(**yolo_kwargs)
+    if backend == "torch":
+        return yolo
+
+    weights = Path(yolo.model_path)
+    onnx_path = weights.with_suffix(".onnx")
+    if _stale(onnx_path, weights):
+        print(f"exporting {weights.name} → {onnx_path.name}")
+        export_onnx(yolo, onnx_path)
+    if backend == "onnx-int8":
+        int8_path = weights.with_suffix(".int8.onnx")
+        if _stale(int8_path, onnx_path):
+            print(f"quantising {onnx_path.name} → {int8_path.name}")
+            quantize_int8(onnx_path, int8_path)
+        onnx_path = int8_path
+
+    yolo.net = OnnxNet(onnx_path, threads)
+    yolo.cuda = False                  # inputs stay on the CPU
+    yolo.onnx_path = str(onnx_path)    # detection cache key: the model actually run
+    return yolo
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+detectserver.py — Keep the YOLO region detector loaded between runs.
+
+Every ``newPredict.py`` run imports torch / ``yolo`` and loads the weights
+before it looks at the first page: seconds of start-up for well under a
+second of detection.  This server loads the model once and answers
+detection requests over localhost HTTP (JSON replies):
+
+  GET  /health         → {"ok": true, "requests": n}
+  POST /detect         {"pdfs": [...], "pages": "1-3", "mask": "redact", "dpi": 144,
+                        "tile": 0, "overlap": 0.2, "batch": 4, "cache": true, "refresh": false}
+                       → runs the newPredict pipeline (same output files next to
+                         each PDF) and returns regions (PDF points) and label
+                         counts per page
+  POST /detect/image   raw PNG/JPEG bytes
+                       → {"boxes": [[x1, y1, x2, y2], ...]} in pixels; with
+                         ?pdf=…&page=N (and optionally &dpi=…) also the regions
+                         in PDF points and the label counts of that page
+
+``newPredict.py --server`` is the client.  Requests are handled on threads;
+inference itself runs one call at a time.  Paths are read on this machine,
+so the server binds to 127.0.0.1 only by default.
+
+Usage
+-----
+```bash
+python detectserver.py                      # http://127.0.0.1:8765
+python newPredict.py --server 1.pdf 3.pdf --pages all
+curl --data-binary @1.jpg "http://127.0.0.1:8765/detect/image?pdf=$PWD/1.pdf&page=1"
+```
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from cpubackend import BACKENDS, load_detector
+from newPredict import (ASSEMBLE_LABELS, DEDUP_THRESHOLD, DETECT_BATCH, RENDER_WORKERS, RENDER_ZOOM,
+                        TILE_OVERLAP, TILE_SIZE, PageImage, count_page, detect_regions, run_pipeline)
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+class LockedDetector:
+    """The loaded model, shared by the request threads; one inference at a time."""
+
+    def __init__(self, yolo):
+        self._yolo = yolo
+        self._lock = threading.Lock()
+        if hasattr(yolo, "detect_images"):
+            self.detect_images = self._detect_images
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._yolo, name)         # model_path etc. (detection cache key)
+
+    def detect_image(self, image, crop=True, count=False):
+        with self._lock:
+            return self._yolo.detect_image(image, crop=crop, count=count)
+
+    def _detect_images(self, images, crop=True, count=False):
+        with self._lock:
+            return self._yolo.detect_images(images, crop=crop, count=count)
+
+
+def _counts(result: Dict) -> Dict[str, int]:
+    return {label: len(boxes) for label, boxes in result.items()}
+
+
+def detect_pdfs(detector, req: Dict) -> Dict:
+    pdfs = [Path(p) for p in req["pdfs"]]
+    missing = [str(p) for p in pdfs if not p.is_file()]
+    if missing:
+        raise FileNotFoundError(f"PDF not found: {', '.join(missing)}")
+    regions, results = run_pipeline(
+        pdfs, detector, str(req.get("pages", "1")),
+        batch_size=int(req.get("batch", DETECT_BATCH)),
+        render_workers=int(req.get("render_workers") or RENDER_WORKERS),
+        post_workers=req.get("post_workers"),
+        mask_mode=req.get("mask", "redact"),
+        zoom=float(req.get("dpi", RENDER_ZOOM * 72)) / 72,
+        tile_px=int(req.get("tile", TILE_SIZE)),
+        overlap=float(req.get("overlap", TILE_OVERLAP)),
+        use_cache=bool(req.get("cache", True)),
+        refresh=bool(req.get("refresh", False)))
+    return {"pdfs": {str(pdf): {str(i + 1): {"regions": regions[pdf].get(i, []),
+                                             "counts": _counts(results[pdf][i])}
+                                for i in sorted(results.get(pdf, {}))}
+                     for pdf in pdfs}}
+
+
+def detect_image_bytes(detector, data: bytes, query: Dict[str, List[str]]) -> Dict:
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    _, boxes = detect_regions(detector, [image])[0]
+    reply: Dict = {"boxes": boxes}
+    if "pdf" in query:
+        pdf = Path(query["pdf"][0])
+        page_index = int(query.get("page", ["1"])[0]) - 1
+        with fitz.open(pdf) as doc:
+            page = doc[page_index]
+            # without dpi the image is taken to show the whole page
+            zoom = float(query["dpi"][0]) / 72 if "dpi" in query else image.width / page.rect.width
+            page_img = PageImage(pdf, page_index, zoom, image, tuple(page.derotation_matrix))
+            rects = [page_img.to_pdf_rect(b) for b in boxes]
+            result = count_page(page, rects, DEDUP_THRESHOLD, ASSEMBLE_LABELS) if rects else {}
+        reply.update(regions=[tuple(r) for r in rects], counts=_counts(result))
+    return reply
+
+
+class DetectHandler(BaseHTTPRequestHandler):
+    server: "DetectServer"
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/health":
+            return self._reply(404, {"error": f"unknown path {self.path}"})
+        self._reply(200, {"ok": True, "requests": self.server.requests})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        start = time.perf_counter()
+        try:
+            if url.path == "/detect":
+                reply = detect_pdfs(self.server.detector, json.loads(data or b"{}"))
+            elif url.path == "/detect/image":
+                reply = detect_image_bytes(self.server.detector, data, parse_qs(url.query))
+            else:
+                return self._reply(404, {"error": f"unknown path {url.path}"})
+        except (KeyError, ValueError, OSError) as e:
+            return self._reply(400, {"error": f"{type(e).__name__}: {e}"})
+        except Exception as e:
+            traceback.print_exc()
+            return self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+        self.server.requests += 1
+        reply["seconds"] = round(time.perf_counter() - start, 3)
+        self._reply(200, reply)
+
+
+class DetectServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, detector):
+        super().__init__(address, DetectHandler)
+        self.detector = LockedDetector(detector)
+        self.requests = 0
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description="Serve YOLO region detection with the model kept loaded.")
+    parser.add_argument("--host", default=HOST, help=f"Address to bind (default: {HOST})")
+    parser.add_argument("--port", type=int, default=PORT, help=f"Port (default: {PORT})")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Detector runtime: torch, or ONNX Runtime fp32 / int8 on the CPU (default: torch)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    server = DetectServer((args.host, args.port), load_detector(args.backend))
+    print(f"✓ model loaded in {time.perf_counter() - start:.1f}s — serving on "
+          f"http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    cli()
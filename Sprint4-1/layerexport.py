@@ -9,49 +9,63 @@ pdf_layer_exporter.py — Export PDF page elements into separate logical "layers
   drawn multiple times or overlayed for clipping/fill effects).
 * Uses a positional hash `(rounded_y, rounded_x, stripped_line)` to keep only
   the first occurrence.
-* Keeps previous fixes (interactive CLI, graceful deps, XML fallback).
+* Keeps previous fixes (interactive CLI, graceful deps).
+* `--jobs N` exports pages in N worker processes (each opens its own
+  `fitz.Document`); file names depend only on the page, so output is the
+  same as a sequential run.
+* Images are de-duplicated document-wide (Common/imageregistry.py): a logo
+  repeated on every sheet is extracted once, under the name of its first
+  occurrence, and `images/manifest.json` maps every page to its files.
+* The vector layer is filtered in one streaming pass (Common/svgstream.py,
+  expat) instead of a BeautifulSoup tree + `prettify()`: constant memory,
+  compact output, no beautifulsoup4/lxml needed.
+* `--vectors compact|bin` writes the vector layer straight from
+  `page.get_drawings()` (Common/drawingexport.py) — no SVG of text and
+  images is generated at all; paths are grouped by stroke colour / width /
+  fill, as compact SVG or as a binary path file (`.pdfv`).  `--quantize Q`
+  snaps coordinates to a Q‑point grid.
 
 Layers produced for every page (0‑indexed):
-  • images/   — raster images (PNG/JPEG) at original resolution
+  • images/   — raster images (PNG/JPEG) at original resolution, each unique
+                image once + manifest.json (page → image files)
   • text/     — **de‑duplicated** UTF‑8 plain‑text files per page
-  • vectors/  — SVGs with vector paths only (images & text stripped) — if
-                *beautifulsoup4* missing, outputs full SVG instead.
+  • vectors/  — SVGs with vector paths only (images & text stripped), or
+                `.pdfv` binary path files with `--vectors bin`
 
 Quick start
 -----------
 ```bash
 pip install pymupdf==1.23.20      # required
-pip install beautifulsoup4 lxml   # optional but recommended
 pip install tqdm                  # progress bar
 ```
 Run with or without arguments:
 ```bash
 python pdf_layer_exporter.py                # interactive mode
 python pdf_layer_exporter.py file.pdf -o out # CLI mode
+python pdf_layer_exporter.py file.pdf -o out --jobs 8   # 8 processes (0 = all cores)
+python pdf_layer_exporter.py file.pdf -o out --vectors compact --quantize 0.1
 ```
 """
 from __future__ import annotations
 
 import argparse
 import importlib
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Tuple, Set
+from typing import List, Optional, Tuple, Set
 
 import fitz  # PyMuPDF
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from drawingexport import collect_groups, write_bin, write_svg
+from imageregistry import MANIFEST_NAME, ImageRegistry
+from svgstream import filter_svg_to
+
 # ---------------------------------------------------------------------------
 # Optional dependencies with graceful fallback
 # ---------------------------------------------------------------------------
-_bs4_spec = importlib.util.find_spec("bs4")
-if _bs4_spec is not None:
-    from bs4 import BeautifulSoup, FeatureNotFound  # type: ignore
-    _HAS_BS4 = True
-else:
-    _HAS_BS4 = False
-    print("[!] beautifulsoup4 not found — vector layer will contain ALL elements."  # noqa: E501
-          "\n    pip install beautifulsoup4 lxml  # for clean paths‑only SVG", file=sys.stderr)
-
 _tqdm_spec = importlib.util.find_spec("tqdm")
 if _tqdm_spec is not None:
     from tqdm import tqdm  # type: ignore
@@ -64,15 +78,19 @@ else:
 # Export helpers
 # ---------------------------------------------------------------------------
 
-def _save_images(page: fitz.Page, page_index: int, root: Path) -> None:
+def _save_images(page: fitz.Page, page_index: int, root: Path, registry: ImageRegistry) -> None:
     img_dir = root / "images"
     img_dir.mkdir(parents=True, exist_ok=True)
     for img_num, img in enumerate(page.get_images(full=True)):
-        xref = img[0]
-        base_image = page.parent.extract_image(xref)
-        ext = base_image["ext"]
-        img_bytes = base_image["image"]
-        (img_dir / f"page{page_index:04d}_img{img_num:03d}.{ext}").write_bytes(img_bytes)
+        def save(xref=img[0], img_num=img_num) -> str:
+            base_image = page.parent.extract_image(xref)
+            ext = base_image["ext"]
+            img_bytes = base_image["image"]
+            name = f"page{page_index:04d}_img{img_num:03d}.{ext}"
+            (img_dir / name).write_bytes(img_bytes)
+            return name
+
+        registry.add(page_index, img, save)
 
 
 def _save_text(page: fitz.Page, page_index: int, root: Path) -> None:
@@ -106,34 +124,95 @@ def _save_text(page: fitz.Page, page_index: int, root: Path) -> None:
     (txt_dir / f"page{page_index:04d}.txt").write_text(plain_text, encoding="utf-8")
 
 
-def _save_vectors(page: fitz.Page, page_index: int, root: Path) -> None:
+VECTOR_DROP = ("image", "text")   # element types removed from the vector layer
+VECTOR_FORMATS = ("svg", "compact", "bin")
+
+
+def _save_vectors(page: fitz.Page, page_index: int, root: Path,
+                  fmt: str = "svg", quantum: Optional[float] = None) -> None:
+    """``svg``: the page's own SVG minus images/text; ``compact``/``bin``: from get_drawings."""
     vec_dir = root / "vectors"
     vec_dir.mkdir(parents=True, exist_ok=True)
-    svg_str = page.get_svg_image(text_as_path=False)
-
-    if _HAS_BS4:
-        try:
-            soup = BeautifulSoup(svg_str, "xml")
-        except FeatureNotFound:
-            print("[!] lxml not installed, falling back to 'html.parser' — SVG cleaning may be less accurate.", file=sys.stderr)
-            soup = BeautifulSoup(svg_str, "html.parser")
-        for tag in soup.find_all(["image", "text"]):
-            tag.decompose()
-        svg_clean = soup.prettify()
+    if fmt == "svg":
+        svg_str = page.get_svg_image(text_as_path=False)
+        # one forward pass straight into the file; no tree, no prettify
+        filter_svg_to(svg_str, vec_dir / f"page{page_index:04d}.svg", VECTOR_DROP)
+        return
+    groups = collect_groups(page, quantum)
+    if fmt == "bin":
+        write_bin(groups, page.rect, vec_dir / f"page{page_index:04d}.pdfv", quantum)
     else:
-        svg_clean = svg_str  # fallback: keep everything
+        write_svg(groups, page.rect, vec_dir / f"page{page_index:04d}.svg", quantum)
+
+
+def _export_page(page: fitz.Page, page_index: int, root: Path,
+                 registry: Optional[ImageRegistry] = None,
+                 vectors: Tuple[str, Optional[float]] = ("svg", None)) -> None:
+    if registry is not None:
+        _save_images(page, page_index, root, registry)
+    _save_text(page, page_index, root)
+    _save_vectors(page, page_index, root, *vectors)
 
-    (vec_dir / f"page{page_index:04d}.svg").write_text(svg_clean, encoding="utf-8")
 
+def _finish_images(registry: ImageRegistry, root: Path) -> None:
+    img_dir = root / "images"
+    img_dir.mkdir(parents=True, exist_ok=True)
+    registry.write_manifest(img_dir / MANIFEST_NAME)
+    if registry.reused:
+        print(f"{len(registry.images)} unique image(s), {registry.reused} repeat(s) not written again")
 
-def export_layers(pdf_path: Path, output_root: Path) -> None:
+
+# Worker processes: MuPDF documents cannot be shared, so every process opens
+# the PDF once (pool initializer) and then exports text and vectors of
+# whichever pages it is given.  Images stay in the main process, where one
+# registry sees the whole document.
+_worker_doc: Optional[fitz.Document] = None
+_worker_root: Optional[Path] = None
+_worker_vectors: Tuple[str, Optional[float]] = ("svg", None)
+
+
+def _init_worker(pdf_path: str, output_root: str, vectors: Tuple[str, Optional[float]]) -> None:
+    global _worker_doc, _worker_root, _worker_vectors
+    _worker_doc = fitz.open(pdf_path)
+    _worker_root = Path(output_root)
+    _worker_vectors = vectors
+
+
+def _export_worker(page_index: int) -> int:
+    _export_page(_worker_doc.load_page(page_index), page_index, _worker_root,
+                 vectors=_worker_vectors)
+    return page_index
+
+
+def export_layers(pdf_path: Path, output_root: Path, jobs: int = 1,
+                  vector_format: str = "svg", quantum: Optional[float] = None) -> None:
+    """Export every page; ``jobs`` > 1 spreads pages over that many processes (0 = CPU count).
+
+    ``vector_format`` is one of ``VECTOR_FORMATS``; ``quantum`` (points) only
+    applies to the get_drawings formats.
+    """
+    vectors = (vector_format, quantum)
     doc = fitz.open(pdf_path)
     total = len(doc)
-    for i in _progress(range(total), desc="Processing pages", unit="page"):
-        page = doc.load_page(i)
-        _save_images(page, i, output_root)
-        _save_text(page, i, output_root)
-        _save_vectors(page, i, output_root)
+    registry = ImageRegistry(doc)
+    jobs = min(jobs or os.cpu_count() or 1, total) if total else 1
+    if jobs <= 1:
+        for i in _progress(range(total), desc="Processing pages", unit="page"):
+            _export_page(doc.load_page(i), i, output_root, registry, vectors)
+        _finish_images(registry, output_root)
+        return
+
+    for layer in ("images", "text", "vectors"):
+        (output_root / layer).mkdir(parents=True, exist_ok=True)
+    with ProcessPoolExecutor(jobs, initializer=_init_worker,
+                             initargs=(str(pdf_path), str(output_root), vectors)) as pool:
+        # one task per page: pages differ a lot in cost, small tasks keep every worker busy
+        futures = [pool.submit(_export_worker, i) for i in range(total)]
+        for i in range(total):
+            _save_images(doc.load_page(i), i, output_root, registry)
+        _finish_images(registry, output_root)
+        for fut in _progress(as_completed(futures), total=total, desc="Processing pages", unit="page"):
+            fut.result()
 
 # ---------------------------------------------------------------------------
 # CLI / Interactive entry
@@ -145,6 +224,13 @@ def cli() -> None:
     )
     parser.add_argument("pdf", nargs="?", help="Path to source PDF (leave blank for prompt)")
     parser.add_argument("-o", "--output", help="Output directory (default: export_layers)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Worker processes for the pages (default: 1, 0 = all cores)")
+    parser.add_argument("--vectors", choices=VECTOR_FORMATS, default="svg",
+                        help="Vector layer: page SVG minus images/text (svg, default), or straight "
+                             "from get_drawings as grouped SVG (compact) or binary paths (bin)")
+    parser.add_argument("--quantize", type=float, metavar="Q",
+                        help="Snap vector coordinates to a Q-point grid (compact/bin only)")
     args = parser.parse_args()
 
     # PDF path — prompt if missing
@@ -167,7 +253,7 @@ def cli() -> None:
     out_root = Path(out_dir_str).expanduser().resolve()
     out_root.mkdir(parents=True, exist_ok=True)
 
-    export_layers(pdf_path, out_root)
+    export_layers(pdf_path, out_root, args.jobs, args.vectors, args.quantize)
     print(f"\n✓ Finished! Layers exported to: {out_root}\n")
 
 
@@ -1,321 +1,549 @@
-<<<<<<< HEAD
 
-import math, os, sys
-import fitz, cv2
+import os, sys
+import argparse
+import json
+import math
+import queue
+import shutil
+import threading
+import fitz
 import numpy as np
-import pandas as pd
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
-from yolo import YOLO
-from typing import Tuple
-
-# PDF to JPG
-def pdf_to_jpg(pdf_path: Path, output_dir: Path) -> Path:
-    output_dir.mkdir(exist_ok=True)
+from PIL import Image, ImageDraw
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib import request as urlrequest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from cpubackend import BACKENDS
+from detectcache import default_cache, detection_key, file_hash, weights_id
+from pagecount import count_page, counts_table, parse_page_range
+from preview import preview_from_render, render_preview, roi_clip
+from roicover import mask_outside
+
+RENDER_ZOOM = 2.0   # ≈300 dpi for detection
+
+
+class PageImage:
+    """A rendered page kept in memory and passed between the stages
+    (render → YOLO detect → pixel/pt scale → preview) instead of going
+    through a JPEG on disk.  Nothing is written unless ``save`` is called."""
+
+    def __init__(self, pdf_path: Path, page_index: int, zoom: float, image: Image.Image,
+                 derotation: Sequence[float] = (1, 0, 0, 1, 0, 0),
+                 origin: Tuple[float, float] = (0.0, 0.0)):
+        self.pdf_path = pdf_path
+        self.page_index = page_index
+        self.zoom = zoom
+        self.image = image
+        self.derotation = tuple(derotation)   # page.derotation_matrix, kept so no page is needed later
+        self.origin = tuple(origin)           # top-left of the clip this image was rendered from (tiles)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.image.size
+
+    def to_page_rect(self, coords_px: Tuple[float, float, float, float]) -> fitz.Rect:
+        """Pixel box (x1, y1, x2, y2) on this render → rect in ``page.rect`` (rotated) points."""
+        x1_px, y1_px, x2_px, y2_px = coords_px
+        rect = fitz.Rect(min(x1_px, x2_px), min(y1_px, y2_px),
+                         max(x1_px, x2_px), max(y1_px, y2_px)) / self.zoom
+        return rect + (*self.origin, *self.origin)
+
+    def to_pdf_rect(self, coords_px: Tuple[float, float, float, float],
+                    page: Optional[fitz.Page] = None) -> fitz.Rect:
+        """Pixel box (x1, y1, x2, y2) on this render → rect in unrotated PDF points."""
+        matrix = page.derotation_matrix if page is not None else fitz.Matrix(*self.derotation)
+        return self.to_page_rect(coords_px) * matrix
+
+    def crop(self, clip: Sequence[float]) -> "PageImage":
+        """The part of this render covering ``clip`` (``page.rect`` points), e.g. for the preview."""
+        ox, oy = self.origin
+        box = (fitz.Rect(clip) - (ox, oy, ox, oy)) * self.zoom
+        box = fitz.IRect(box.round()) & fitz.IRect(0, 0, *self.size)
+        return PageImage(self.pdf_path, self.page_index, self.zoom, self.image.crop(tuple(box)),
+                         self.derotation, (ox + box.x0 / self.zoom, oy + box.y0 / self.zoom))
+
+    def save(self, path: Path, **kwargs) -> Path:
+        self.image.save(path, **kwargs)
+        return path
+
+
+def render_page(pdf_path: Path, page_index: int = 0, zoom: float = RENDER_ZOOM,
+                clip: Optional[Sequence[float]] = None) -> PageImage:
+    """Render a page, or only ``clip`` of it (``page.rect`` coordinates) for tiled detection."""
     with fitz.open(pdf_path) as doc:
-        page = doc[0]
-        pix  = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # ≈300 dpi
-        jpg_path = output_dir / f"{pdf_path.stem}_page_1.jpg"
-        Image.frombytes("RGB", [pix.width, pix.height], pix.samples)\
-             .save(jpg_path, quality=95, subsampling=0)
-    print(f"✔ Image saved: {jpg_path}")
-    return jpg_path
+        page = doc[page_index]
+        clip = fitz.Rect(clip) if clip is not None else page.rect
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False)
+        image = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        derotation = tuple(page.derotation_matrix)
+    # the pixmap starts at the pixel the clip was rounded out to
+    return PageImage(pdf_path, page_index, zoom, image, derotation, (pix.x / zoom, pix.y / zoom))
+
 
 DEDUP_THRESHOLD = 5.0
+ASSEMBLE_LABELS = False   # re-join tags split into several words ("BP" "1" -> "BP1")
 LINE_COLOR      = (0, 1, 1)
 LINE_WIDTH      = 2
 PREVIEW_ZOOM    = 2.0
-
-def center(coord): return ((coord[0]+coord[2])/2, (coord[1]+coord[3])/2)
-
-def is_close(new, existing, thr=DEDUP_THRESHOLD):
-    nc = center(new)
-    return any(math.hypot(nc[0]-center(c)[0], nc[1]-center(c)[1]) < thr for c in existing)
-
-def subtract_rect(base, sub):
-    if not base.intersects(sub): return [base]
-    inter = base & sub; r=[]
-    if inter.y0>base.y0: r.append(fitz.Rect(base.x0,base.y0,base.x1,inter.y0))
-    if inter.y1<base.y1: r.append(fitz.Rect(base.x0,inter.y1,base.x1,base.y1))
-    if inter.x0>base.x0: r.append(fitz.Rect(base.x0,inter.y0,inter.x0,inter.y1))
-    if inter.x1<base.x1: r.append(fitz.Rect(inter.x1,inter.y0,base.x1,inter.y1))
-    return r
-
-def subtract_rects(full_rect, subs):
-    covers=[full_rect]
-    for s in subs:
-        tmp=[]
-        for r in covers: tmp.extend(subtract_rect(r,s))
-        covers=tmp
-    return covers
-
-def pdf_postprocess(pdf_path: Path, img_path: Path,
-                    coords_px: Tuple[float, float, float, float],
-                    out_dir: Path):
-
-    doc  = fitz.open(pdf_path)
-    page = doc[0]
-
-    # ---------- ① 计算缩放，把像素坐标转换为 PDF pt ----------
-    pw, ph = page.rect.width, page.rect.height
-    img_w, img_h = Image.open(img_path).size
-    zx, zy = img_w / pw, img_h / ph
-    if abs(zx - zy) > 1e-3:
-        print("x/y scaling is inconsistent, take average")
-    zoom = (zx + zy) / 2
-
-    x1_px, y1_px, x2_px, y2_px = coords_px
-    x1_pt, y1_pt = x1_px / zoom, y1_px / zoom
-    x2_pt, y2_pt = x2_px / zoom, y2_px / zoom
-    region_rect  = fitz.Rect(min(x1_pt, x2_pt), min(y1_pt, y2_pt),
-                             max(x1_pt, x2_pt), max(y1_pt, y2_pt))
-
-
-    page.draw_rect(region_rect, color=LINE_COLOR, width=LINE_WIDTH)
-
-
-    words = page.get_text("words")
-    dedup = {}
-    for w in words:
-        cx, cy = (w[0] + w[2]) / 2, (w[1] + w[3]) / 2
-        if region_rect.contains(fitz.Point(cx, cy)):
-            lbl = w[4].strip()
-            if not lbl:
-                continue
-            dedup.setdefault(lbl, [])
-            if not is_close(w[:4], dedup[lbl]):
-                dedup[lbl].append(w[:4])
-    counts = {k: len(v) for k, v in dedup.items()}
-
-
-    pix = page.get_pixmap(matrix=fitz.Matrix(PREVIEW_ZOOM, PREVIEW_ZOOM))
-    np_img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-    if pix.n == 4:
-        np_img = np_img[..., :3]
-    pil_img = Image.fromarray(np_img)
-    draw = ImageDraw.Draw(pil_img)
-    cmap = plt.get_cmap("tab10")
-    try:
-        font = ImageFont.truetype("arial.ttf", 16)
-    except IOError:
-        font = ImageFont.load_default()
-    for i, (lbl, boxes) in enumerate(dedup.items()):
-        rgb = tuple(int(255 * c) for c in cmap(i % 10)[:3])
-        for b in boxes:
-            x0, y0, x1, y1 = [v * PREVIEW_ZOOM for v in b]
-            draw.rectangle([x0, y0, x1, y1], outline=rgb, width=2)
-            draw.text((x0, y0), lbl, fill=rgb, font=font)
-    preview_path = out_dir / f"{pdf_path.stem}_preview.png"
-    pil_img.save(preview_path)
-
-
-    cover_rects = subtract_rects(page.rect, [region_rect])
-    for cr in cover_rects:
-        annot = page.add_redact_annot(cr)
-        annot.set_colors(stroke=None, fill=(1, 1, 1))
-        annot.update()
-    page.apply_redactions()
-
-
-    marked_pdf = out_dir / f"{pdf_path.stem}_marked.pdf"
-    doc.save(marked_pdf, deflate=True)
-    doc.close()
-
-    df = pd.DataFrame(counts.items(), columns=["Element", "Count"])
-    excel_path = out_dir / f"{pdf_path.stem}_label_counts.xlsx"
-    df.to_excel(excel_path, index=False)
-
-    print("\n=== PDF post-processing completed ===")
-    print("preview image  →", preview_path)
-    print("mark PDF →", marked_pdf)
-    print("counting table  →", excel_path)
-
-
-
-if __name__ == "__main__":
-    pdf_path = Path(input("PDF Path: ").strip().strip('"'))
-    if not pdf_path.exists():
-        sys.exit("PDF not found.")
-
+PREVIEW_MAX_PIXELS = 25_000_000   # preview zoom is lowered above this many pixels
+SAVE_PAGE_IMAGE = False   # write the detection render as <stem>_page_N.jpg
+SAVE_ANNOTATED  = True    # write YOLO's annotated image as <stem>_annotated.png
+
+# ---------------------------------------------------------------------------
+# Batched multi-page pipeline
+# ---------------------------------------------------------------------------
+# render processes → bounded queue → detector (batches, this process)
+#                  → post-processing processes (count + preview per page,
+#                    then mark PDF + Excel once all pages of a PDF are done)
+# MuPDF documents are not thread-safe, so rendering and post-processing run in
+# processes, each opening its own fitz.Document.
+DETECT_BATCH   = 4    # page images per detector call
+RENDER_WORKERS = 2    # render processes
+QUEUE_SIZE     = 8    # rendered pages waiting for the detector (bounds memory)
+
+# Tiled detection: a whole A0/A1 sheet is shrunk to the model input and loses
+# the detail the detector needs.  With TILE_SIZE set, every page is cut into
+# overlapping tiles of that many pixels at the render DPI; each tile is
+# rendered on its own through a clip rectangle (memory does not grow with the
+# sheet) and detected like a page, and the boxes of all tiles are mapped back
+# to the page and merged.
+TILE_SIZE    = 0      # tile edge in px; 0 = detect on the whole page
+TILE_OVERLAP = 0.2    # fraction of a tile shared with its neighbour
+MAX_OVERLAP  = 0.9    # more is capped: neighbours stay at least a tenth of a tile apart
+NMS_IOU      = 0.5    # boxes overlapping more than this (IoU) are one detection …
+NMS_CONTAIN  = 0.8    # … as are boxes lying this much inside another one
+
+
+def detect_regions(yolo, images: Sequence[Image.Image], crop: bool = True,
+                   count: bool = False) -> List[Tuple[Image.Image, List[Tuple[float, float, float, float]]]]:
+    """Detect on a batch of page images; returns ``(annotated image, [(x1, y1, x2, y2) px, ...])`` each.
+
+    Uses ``yolo.detect_images`` when the detector has a batched entry point,
+    else ``detect_image`` per image.  ``coord_raw`` may hold one box
+    (top, left, bottom, right) or several; every box becomes a region.
+    """
+    # YOLO draws its boxes onto the images it is given; keep the renders clean
+    copies = [img.copy() for img in images]
+    detect_batch = getattr(yolo, "detect_images", None)
+    if detect_batch is not None:
+        outputs = detect_batch(copies, crop=crop, count=count)
+    else:
+        outputs = [yolo.detect_image(img, crop=crop, count=count) for img in copies]
+
+    results = []
+    for r_img, coord_raw in outputs:
+        boxes = [] if coord_raw is None else np.asarray(coord_raw, dtype=float).reshape(-1, 4).tolist()
+        results.append((r_img, [(l, t, r, b) for t, l, b, r in boxes]))  # yx→xy
+    return results
+
+
+def tile_clips(page_rect: fitz.Rect, zoom: float, tile_px: int,
+               overlap: float = TILE_OVERLAP) -> List[fitz.Rect]:
+    """Overlapping clips of ``tile_px`` × ``tile_px`` pixels covering ``page_rect``, row by row.
+
+    Tiles are spread evenly with the last one flush with the page edge, so
+    neighbours share at least ``overlap`` of a tile.  ``overlap`` must be in
+    [0, 1) and is capped at ``MAX_OVERLAP``.
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError(f"tile overlap must be in [0, 1), got {overlap}")
+    overlap = min(overlap, MAX_OVERLAP)
+    size = tile_px / zoom
+
+    def starts(lo: float, hi: float) -> List[float]:
+        if hi - lo <= size:
+            return [lo]
+        n = math.ceil((hi - lo - size) / (size * (1 - overlap)))
+        return [lo + k * (hi - lo - size) / n for k in range(n + 1)]
+
+    r = fitz.Rect(page_rect)
+    return [fitz.Rect(x, y, min(x + size, r.x1), min(y + size, r.y1))
+            for y in starts(r.y0, r.y1) for x in starts(r.x0, r.x1)]
+
+
+def is_cut(rect: fitz.Rect, tile: fitz.Rect, page_rect: fitz.Rect, tol: float) -> bool:
+    """True if ``rect`` ends on a tile edge inside the page — the object may go on in the next tile."""
+    return ((tile.x0 > page_rect.x0 and rect.x0 - tile.x0 <= tol)
+            or (tile.y0 > page_rect.y0 and rect.y0 - tile.y0 <= tol)
+            or (tile.x1 < page_rect.x1 and tile.x1 - rect.x1 <= tol)
+            or (tile.y1 < page_rect.y1 and tile.y1 - rect.y1 <= tol))
+
+
+def merge_boxes(rects: Sequence[fitz.Rect], cut: Sequence[bool], iou: float = NMS_IOU,
+                contain: float = NMS_CONTAIN) -> List[fitz.Rect]:
+    """Merge the boxes of overlapping tiles into one box per detection.
+
+    Greedy NMS, largest box first: a box with IoU ≥ ``iou`` with a kept box,
+    or lying ``contain`` inside one, is the same detection seen twice.  If
+    either of them was cut at a tile edge the two are joined (union) instead
+    of dropping one, and two cut boxes that overlap at all are joined too —
+    a region larger than a tile is rebuilt from its pieces.  Repeats until
+    nothing changes, so pieces from 2 × 2 tiles come together.
+    """
+    items = sorted(((fitz.Rect(r), bool(c)) for r, c in zip(rects, cut)),
+                   key=lambda item: -item[0].get_area())
+    changed = True
+    while changed:
+        changed = False
+        kept: List[Tuple[fitz.Rect, bool]] = []
+        for rect, c in items:
+            for k, (other, oc) in enumerate(kept):
+                inter = fitz.Rect(rect) & other
+                if inter.is_empty:
+                    continue
+                a = inter.get_area()
+                same = (a / (rect.get_area() + other.get_area() - a) >= iou
+                        or a / max(min(rect.get_area(), other.get_area()), 1e-9) >= contain)
+                if (c or oc) and (same or (c and oc)):
+                    kept[k] = (other | rect, c and oc)
+                elif not same:
+                    continue
+                changed = True
+                break
+            else:
+                kept.append((rect, c))
+        items = kept
+    return [rect for rect, _ in items]
+
+
+def _output_dir(pdf_path: Path) -> Path:
     out_dir = pdf_path.parent / pdf_path.stem
-    jpg_path = pdf_to_jpg(pdf_path, out_dir)
-
-
-    yolo = YOLO(); crop=True; count=False
-    r_img, coord_raw = yolo.detect_image(Image.open(jpg_path), crop=crop, count=count)
-    if coord_raw is None or len(coord_raw)!=4:
-        sys.exit("No detection.")
-    coord_px = (coord_raw[1], coord_raw[0], coord_raw[3], coord_raw[2])  # yx→xy
-
-
-    annotated_path = out_dir / f"{pdf_path.stem}_annotated.png"
-    r_img.save(annotated_path, quality=95, subsampling=0)
-    print("Coordinate", coord_px)
-
-
-    try:
-        pdf_postprocess(pdf_path, annotated_path, coord_px, out_dir)
-    except Exception as e:
-        print("Post-processing failed:", e)
-=======
-
-import math, os, sys
-import fitz, cv2
-import numpy as np
-import pandas as pd
-from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
-import matplotlib.pyplot as plt
-from yolo import YOLO
-from typing import Tuple
-
-# PDF to JPG
-def pdf_to_jpg(pdf_path: Path, output_dir: Path) -> Path:
-    output_dir.mkdir(exist_ok=True)
+    out_dir.mkdir(exist_ok=True)
+    return out_dir
+
+
+def _render_worker(pdf_path: str, page_index: int, zoom: float,
+                   clip: Optional[Tuple[float, ...]] = None) -> PageImage:
+    page_img = render_page(Path(pdf_path), page_index, zoom, clip)
+    if SAVE_PAGE_IMAGE and clip is None:
+        page_img.save(_output_dir(Path(pdf_path)) / f"{Path(pdf_path).stem}_page_{page_index + 1}.jpg",
+                      quality=95, subsampling=0)
+    return page_img
+
+
+def _count_worker(pdf_path: str, page_index: int, rects: List[Tuple[float, ...]],
+                  page_img: Optional[PageImage] = None) -> Dict:
+    """Count the labels inside the detected regions of one page and save its preview.
+
+    ``page_img`` is the part of the detection render around the regions; the
+    preview is drawn on it instead of rendering the page again.  Without it
+    (tiled detection, cached detections) the preview area is rendered.
+    """
+    pdf_path = Path(pdf_path)
+    if not rects:
+        return {}
     with fitz.open(pdf_path) as doc:
-        page = doc[0]
-        pix  = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # ≈300 dpi
-        jpg_path = output_dir / f"{pdf_path.stem}_page_1.jpg"
-        Image.frombytes("RGB", [pix.width, pix.height], pix.samples)\
-             .save(jpg_path, quality=95, subsampling=0)
-    print(f"✔ Image saved: {jpg_path}")
-    return jpg_path
-
-DEDUP_THRESHOLD = 5.0
-LINE_COLOR      = (0, 1, 1)
-LINE_WIDTH      = 2
-PREVIEW_ZOOM    = 2.0
-
-def center(coord): return ((coord[0]+coord[2])/2, (coord[1]+coord[3])/2)
-
-def is_close(new, existing, thr=DEDUP_THRESHOLD):
-    nc = center(new)
-    return any(math.hypot(nc[0]-center(c)[0], nc[1]-center(c)[1]) < thr for c in existing)
-
-def subtract_rect(base, sub):
-    if not base.intersects(sub): return [base]
-    inter = base & sub; r=[]
-    if inter.y0>base.y0: r.append(fitz.Rect(base.x0,base.y0,base.x1,inter.y0))
-    if inter.y1<base.y1: r.append(fitz.Rect(base.x0,inter.y1,base.x1,base.y1))
-    if inter.x0>base.x0: r.append(fitz.Rect(base.x0,inter.y0,inter.x0,inter.y1))
-    if inter.x1<base.x1: r.append(fitz.Rect(inter.x1,inter.y0,base.x1,inter.y1))
-    return r
-
-def subtract_rects(full_rect, subs):
-    covers=[full_rect]
-    for s in subs:
-        tmp=[]
-        for r in covers: tmp.extend(subtract_rect(r,s))
-        covers=tmp
-    return covers
-
-def pdf_postprocess(pdf_path: Path, img_path: Path,
-                    coords_px: Tuple[float, float, float, float],
-                    out_dir: Path):
-
-    doc  = fitz.open(pdf_path)
-    page = doc[0]
-
-    # ---------- ① 计算缩放，把像素坐标转换为 PDF pt ----------
-    pw, ph = page.rect.width, page.rect.height
-    img_w, img_h = Image.open(img_path).size
-    zx, zy = img_w / pw, img_h / ph
-    if abs(zx - zy) > 1e-3:
-        print("x/y scaling is inconsistent, take average")
-    zoom = (zx + zy) / 2
-
-    x1_px, y1_px, x2_px, y2_px = coords_px
-    x1_pt, y1_pt = x1_px / zoom, y1_px / zoom
-    x2_pt, y2_pt = x2_px / zoom, y2_px / zoom
-    region_rect  = fitz.Rect(min(x1_pt, x2_pt), min(y1_pt, y2_pt),
-                             max(x1_pt, x2_pt), max(y1_pt, y2_pt))
-
-
-    page.draw_rect(region_rect, color=LINE_COLOR, width=LINE_WIDTH)
-
-
-    words = page.get_text("words")
-    dedup = {}
-    for w in words:
-        cx, cy = (w[0] + w[2]) / 2, (w[1] + w[3]) / 2
-        if region_rect.contains(fitz.Point(cx, cy)):
-            lbl = w[4].strip()
-            if not lbl:
-                continue
-            dedup.setdefault(lbl, [])
-            if not is_close(w[:4], dedup[lbl]):
-                dedup[lbl].append(w[:4])
-    counts = {k: len(v) for k, v in dedup.items()}
-
-
-    pix = page.get_pixmap(matrix=fitz.Matrix(PREVIEW_ZOOM, PREVIEW_ZOOM))
-    np_img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-    if pix.n == 4:
-        np_img = np_img[..., :3]
-    pil_img = Image.fromarray(np_img)
-    draw = ImageDraw.Draw(pil_img)
-    cmap = plt.get_cmap("tab10")
+        page = doc[page_index]
+        result = count_page(page, rects, DEDUP_THRESHOLD, ASSEMBLE_LABELS)
+        if page_img is not None:
+            # region outlines onto the render, as draw_rect would have drawn them
+            ox, oy = page_img.origin
+            draw = ImageDraw.Draw(page_img.image)
+            rgb = tuple(int(255 * c) for c in LINE_COLOR)
+            for r in rects:
+                outline = (fitz.Rect(r) * page.rotation_matrix - (ox, oy, ox, oy)) * page_img.zoom
+                draw.rectangle([outline.x0, outline.y0, outline.x1, outline.y1], outline=rgb,
+                               width=max(1, round(LINE_WIDTH * page_img.zoom)))
+            preview = preview_from_render(page_img.image, page_img.zoom, page, result, rects,
+                                          origin=page_img.origin)
+        else:
+            for r in rects:
+                page.draw_rect(r, color=LINE_COLOR, width=LINE_WIDTH)
+            preview = render_preview(page, result, rects, PREVIEW_ZOOM, PREVIEW_MAX_PIXELS)
+        preview.save(_output_dir(pdf_path) / f"{pdf_path.stem}_page_{page_index + 1}_preview.png")
+    return result
+
+
+def _finish_worker(pdf_path: str, regions: Dict[int, List[Tuple[float, ...]]],
+                   results: Dict[int, Dict], mask_mode: str) -> Path:
+    """Mark and mask every page with its own regions, then write the PDF and the Excel table."""
+    pdf_path = Path(pdf_path)
+    out_dir = _output_dir(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        for i, rects in regions.items():
+            for r in rects:
+                doc[i].draw_rect(r, color=LINE_COLOR, width=LINE_WIDTH)
+            if rects:
+                mask_outside(doc, [i], rects, mask_mode)
+        marked_pdf = out_dir / f"{pdf_path.stem}_marked.pdf"
+        doc.save(marked_pdf, deflate=True)
+    counts_table({i: results[i] for i in sorted(results)}).to_excel(
+        out_dir / f"{pdf_path.stem}_label_counts.xlsx", index=False)
+    return marked_pdf
+
+
+def run_pipeline(pdf_paths: Sequence[Path], yolo, page_spec: str = "all",
+                 batch_size: int = DETECT_BATCH, render_workers: int = RENDER_WORKERS,
+                 post_workers: Optional[int] = None, queue_size: int = QUEUE_SIZE,
+                 mask_mode: str = "redact", zoom: float = RENDER_ZOOM,
+                 tile_px: int = TILE_SIZE, overlap: float = TILE_OVERLAP,
+                 use_cache: bool = True, refresh: bool = False
+                 ) -> Tuple[Dict[Path, Dict[int, List[Tuple[float, ...]]]], Dict[Path, Dict[int, Dict]]]:
+    """Detect, count and mark every selected page of every PDF with the stages overlapping.
+
+    With ``tile_px`` > 0 the detector sees overlapping tiles instead of whole
+    pages (see ``tile_clips`` / ``merge_boxes``); queue and batches then hold
+    tiles, so memory is bounded by the tile size, not the sheet size.
+    Detections are taken from / stored in the ``detectcache`` cache unless
+    ``use_cache`` is False; ``refresh`` detects again and overwrites them.
+    Returns ``(regions, results)``: ``{pdf: {page_index: [rects]}}`` and
+    ``{pdf: {page_index: {label: boxes}}}``.
+    """
+    cache = default_cache() if use_cache else None
+    weights = weights_id(yolo) if cache is not None else None
+    if cache is not None and weights is None:
+        print("[!] detection cache off: the detector's weights file is unknown", file=sys.stderr)
+        cache = None
+
+    # one job per page, or per tile: (pdf, page index, tile number, clip, cache key)
+    jobs: List[Tuple[Path, int, Optional[int], Optional[fitz.Rect], str]] = []
+    page_rects: Dict[Tuple[Path, int], fitz.Rect] = {}
+    digests = {pdf: file_hash(pdf) for pdf in pdf_paths} if cache is not None else {}
+    for pdf in pdf_paths:
+        with fitz.open(pdf) as doc:
+            for i in parse_page_range(page_spec, len(doc)):
+                page_rects[pdf, i] = doc[i].rect
+                clips = tile_clips(doc[i].rect, zoom, tile_px, overlap) if tile_px > 0 else [None]
+                jobs += [(pdf, i, k if tile_px > 0 else None, clip,
+                          detection_key(i, zoom, clip, weights) if cache is not None else "")
+                         for k, clip in enumerate(clips)]
+    if not jobs:
+        return {}, {}
+    remaining = {pdf: sum(1 for p, _ in page_rects if p == pdf) for pdf in pdf_paths}
+    tiles_left = {key: 0 for key in page_rects}
+    for pdf, i, *_ in jobs:
+        tiles_left[pdf, i] += 1
+    found: Dict[Tuple[Path, int], List[Tuple[fitz.Rect, bool]]] = {key: [] for key in page_rects}
+    derotations: Dict[Tuple[Path, int], fitz.Matrix] = {}
+    regions: Dict[Path, Dict[int, List[Tuple[float, ...]]]] = {pdf: {} for pdf in remaining}
+    results: Dict[Path, Dict[int, Dict]] = {pdf: {} for pdf in remaining}
+    rendered: "queue.Queue[Optional[Tuple[Path, int, Optional[int], str, Future]]]" = queue.Queue(maxsize=queue_size)
+    hits = 0
+
+    with ProcessPoolExecutor(render_workers) as render_pool, \
+            ProcessPoolExecutor(post_workers) as post_pool, \
+            ThreadPoolExecutor(1) as writer:
+
+        def feed():
+            # blocks once queue_size renders are waiting: memory stays bounded
+            try:
+                for pdf, i, k, clip, key in jobs:
+                    try:
+                        hit = cache.load(digests[pdf], key) if cache is not None and not refresh else None
+                        if hit is not None:
+                            fut = Future()           # cached detection: no render, no inference
+                            fut.set_result(hit)
+                        else:
+                            fut = render_pool.submit(_render_worker, str(pdf), i, zoom,
+                                                     None if clip is None else tuple(clip))
+                    except Exception as e:
+                        fut = Future()               # reported as a failed render of this page
+                        fut.set_exception(e)
+                    rendered.put((pdf, i, k, key, fut))
+            finally:
+                rendered.put(None)                   # the detector loop always ends
+
+        threading.Thread(target=feed, daemon=True).start()
+        counting: Dict[Future, Tuple[Path, int]] = {}
+        renders: Dict[Tuple[Path, int], PageImage] = {}   # whole-page renders, kept for the preview
+        finishing: List[Future] = []
+
+        def page_done(pdf: Path, i: int, result: Dict):
+            results[pdf][i] = result
+            remaining[pdf] -= 1
+            if remaining[pdf] == 0:
+                finishing.append(post_pool.submit(_finish_worker, str(pdf), regions[pdf],
+                                                  results[pdf], mask_mode))
+
+        def tile_done(pdf: Path, i: int):
+            # all tiles of a page detected: merge their boxes and count the page
+            tiles_left[pdf, i] -= 1
+            if tiles_left[pdf, i]:
+                return
+            boxes = found.pop((pdf, i))
+            if tile_px > 0:
+                boxes = [(r, False) for r in merge_boxes([r for r, _ in boxes], [c for _, c in boxes])]
+            matrix = derotations.pop((pdf, i), fitz.Identity)
+            rects = [tuple(r * matrix) for r, _ in boxes]
+            regions[pdf][i] = rects
+            print(f"{pdf.name} page {i + 1}: {len(rects)} region(s)")
+            page_img = renders.pop((pdf, i), None)
+            if page_img is not None and rects:
+                # only the preview area goes to the worker, not the whole sheet
+                clip = roi_clip(page_rects[pdf, i], ~matrix, rects)
+                page_img = page_img.crop(clip)
+            counting[post_pool.submit(_count_worker, str(pdf), i, rects, page_img)] = (pdf, i)
+
+        def save_detection(pdf: Path, k: Optional[int], key: str, r_img: Image.Image, record: Dict):
+            out = None
+            if SAVE_ANNOTATED and record["boxes"]:
+                name = f"{pdf.stem}_page_{record['page'] + 1}" + ("" if k is None else f"_tile_{k + 1}")
+                out = _output_dir(pdf) / f"{name}_annotated.png"
+                r_img.save(out)
+            if cache is not None:
+                cache.store(digests[pdf], key, record, (out or r_img) if record["boxes"] else None)
+
+        def use_cached(pdf: Path, k: Optional[int], record: Dict, png: Optional[Path]):
+            if SAVE_ANNOTATED and png is not None:
+                name = f"{pdf.stem}_page_{record['page'] + 1}" + ("" if k is None else f"_tile_{k + 1}")
+                writer.submit(shutil.copyfile, png, _output_dir(pdf) / f"{name}_annotated.png")
+
+        def collect(block: bool):
+            for fut in [f for f in counting if block or f.done()]:
+                pdf, i = counting.pop(fut)
+                try:
+                    page_done(pdf, i, fut.result())
+                except Exception as e:
+                    print(f"[!] {pdf.name} page {i + 1}: post-processing failed — {e}", file=sys.stderr)
+                    page_done(pdf, i, {})
+
+        finished = False
+        while not finished:
+            batch = [rendered.get()]
+            while batch[-1] is not None and len(batch) < batch_size:
+                try:
+                    batch.append(rendered.get_nowait())   # only what is ready; never stall the detector
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+
+            images = []
+            for pdf, i, k, key, fut in batch:
+                try:
+                    item = fut.result()
+                except Exception as e:
+                    where = f"page {i + 1}" if k is None else f"page {i + 1} tile {k + 1}"
+                    print(f"[!] {pdf.name} {where}: rendering failed — {e}", file=sys.stderr)
+                    tile_done(pdf, i)
+                    continue
+                if isinstance(item, PageImage):
+                    images.append((pdf, i, k, key, item))
+                    continue
+                record, png = item
+                hits += 1
+                found[pdf, i] += [(fitz.Rect(r), c) for r, c in zip(record["rects"], record["cut"])]
+                derotations[pdf, i] = fitz.Matrix(*record["derotation"])
+                use_cached(pdf, k, record, png)
+                tile_done(pdf, i)
+
+            detections = detect_regions(yolo, [img.image for *_, img in images]) if images else []
+            for (pdf, i, k, key, page_img), (r_img, boxes) in zip(images, detections):
+                tile = page_img.to_page_rect((0, 0, *page_img.size))
+                tol = 2 / page_img.zoom
+                rects = [page_img.to_page_rect(b) for b in boxes]
+                cut = [is_cut(r, tile, page_rects[pdf, i], tol) for r in rects]
+                found[pdf, i] += list(zip(rects, cut))
+                derotations[pdf, i] = fitz.Matrix(*page_img.derotation)
+                record = {"page": i, "zoom": page_img.zoom, "origin": page_img.origin,
+                          "size": page_img.size, "derotation": page_img.derotation,
+                          "boxes": boxes, "rects": [tuple(r) for r in rects], "cut": cut}
+                writer.submit(save_detection, pdf, k, key, r_img, record)
+                if k is None:
+                    renders[pdf, i] = page_img
+                tile_done(pdf, i)
+            collect(block=False)
+
+        collect(block=True)
+        if cache is not None:
+            print(f"detection cache: {hits}/{len(jobs)} hit(s)")
+        for fut in finishing:
+            try:
+                print("mark PDF →", fut.result())
+            except Exception as e:
+                print(f"[!] writing outputs failed — {e}", file=sys.stderr)
+    return regions, results
+
+
+# ---------------------------------------------------------------------------
+# Client of detectserver.py (model stays loaded there between runs)
+# ---------------------------------------------------------------------------
+SERVER_ENV = "PDFIT_DETECT_SERVER"          # default --server URL
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+
+
+def server_alive(url: str, timeout: float = 0.5) -> bool:
     try:
-        font = ImageFont.truetype("arial.ttf", 16)
-    except IOError:
-        font = ImageFont.load_default()
-    for i, (lbl, boxes) in enumerate(dedup.items()):
-        rgb = tuple(int(255 * c) for c in cmap(i % 10)[:3])
-        for b in boxes:
-            x0, y0, x1, y1 = [v * PREVIEW_ZOOM for v in b]
-            draw.rectangle([x0, y0, x1, y1], outline=rgb, width=2)
-            draw.text((x0, y0), lbl, fill=rgb, font=font)
-    preview_path = out_dir / f"{pdf_path.stem}_preview.png"
-    pil_img.save(preview_path)
-
-
-    cover_rects = subtract_rects(page.rect, [region_rect])
-    for cr in cover_rects:
-        annot = page.add_redact_annot(cr)
-        annot.set_colors(stroke=None, fill=(1, 1, 1))
-        annot.update()
-    page.apply_redactions()
-
-
-    marked_pdf = out_dir / f"{pdf_path.stem}_marked.pdf"
-    doc.save(marked_pdf, deflate=True)
-    doc.close()
-
-    df = pd.DataFrame(counts.items(), columns=["Element", "Count"])
-    excel_path = out_dir / f"{pdf_path.stem}_label_counts.xlsx"
-    df.to_excel(excel_path, index=False)
-
-    print("\n=== PDF post-processing completed ===")
-    print("preview image  →", preview_path)
-    print("mark PDF →", marked_pdf)
-    print("counting table  →", excel_path)
-
+        with urlrequest.urlopen(url.rstrip("/") + "/health", timeout=timeout) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+
+def detect_remote(url: str, pdf_paths: Sequence[Path], page_spec: str = "all", **options) -> Dict:
+    """Run the pipeline on the detection server; ``options`` as in the /detect request
+    (mask, dpi, tile, overlap, batch).  Returns ``{pdf: {page: {"regions", "counts"}}}``."""
+    payload = dict(options, pdfs=[str(p.resolve()) for p in pdf_paths], pages=page_spec)
+    req = urlrequest.Request(url.rstrip("/") + "/detect", data=json.dumps(payload).encode(),
+                             headers={"Content-Type": "application/json"})
+    with urlrequest.urlopen(req) as resp:
+        return json.load(resp)["pdfs"]
+
+
+def _overlap(text: str) -> float:
+    value = float(text)
+    if not 0 <= value < 1:
+        raise argparse.ArgumentTypeError(f"must be in [0, 1), got {text}")
+    return value
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description="Detect the counting region(s) on every page with YOLO, then count, preview and mark.")
+    parser.add_argument("pdfs", nargs="*", help="PDF files (leave blank for prompt)")
+    parser.add_argument("--pages", help="Pages to process, e.g. 1-3,7 or all (prompted if omitted)")
+    parser.add_argument("--batch", type=int, default=DETECT_BATCH, help=f"Pages per detector call (default: {DETECT_BATCH})")
+    parser.add_argument("--render-workers", type=int, default=RENDER_WORKERS,
+                        help=f"Render processes (default: {RENDER_WORKERS})")
+    parser.add_argument("--post-workers", type=int, help="Post-processing processes (default: CPU count)")
+    parser.add_argument("--dpi", type=float, default=RENDER_ZOOM * 72,
+                        help=f"Render resolution for detection (default: {RENDER_ZOOM * 72:g})")
+    parser.add_argument("--tile", type=int, default=TILE_SIZE,
+                        help="Detect on overlapping tiles of this many px instead of the whole page (0 = off)")
+    parser.add_argument("--overlap", type=_overlap, default=TILE_OVERLAP,
+                        help=f"Fraction of a tile shared with its neighbour, in [0, 1), capped at {MAX_OVERLAP} "
+                             f"(default: {TILE_OVERLAP})")
+    parser.add_argument("--mask", choices=("redact", "overlay"), default="redact",
+                        help="redact: remove content outside the regions; overlay: paint it white (fast)")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="Detector runtime: torch, or ONNX Runtime fp32 / int8 on the CPU (default: torch)")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the detection cache")
+    parser.add_argument("--refresh", action="store_true", help="Detect again and overwrite cached detections")
+    parser.add_argument("--server", nargs="?", const=DEFAULT_SERVER, default=os.environ.get(SERVER_ENV),
+                        help=f"Send the job to a running detectserver.py (default URL: {DEFAULT_SERVER}, "
+                             f"or ${SERVER_ENV}); the model is loaded here if none answers")
+    args = parser.parse_args()
+
+    pdf_paths = [Path(p).expanduser() for p in args.pdfs] or [Path(input("PDF Path: ").strip().strip('"'))]
+    missing = [p for p in pdf_paths if not p.exists()]
+    if missing:
+        sys.exit(f"PDF not found: {', '.join(map(str, missing))}")
+    page_spec = args.pages
+    if page_spec is None:
+        page_spec = input("Pages to process (e.g. 1-3,7 or all; blank = page 1): ").strip() or "1"
+
+    if args.server:
+        if server_alive(args.server):
+            replies = detect_remote(args.server, pdf_paths, page_spec, batch=args.batch,
+                                    render_workers=args.render_workers, post_workers=args.post_workers,
+                                    mask=args.mask, dpi=args.dpi, tile=args.tile, overlap=args.overlap,
+                                    cache=not args.no_cache, refresh=args.refresh)
+            for pdf, pages in replies.items():
+                for n, page in pages.items():
+                    print(f"{Path(pdf).name} page {n}: {len(page['regions'])} region(s), "
+                          f"{sum(page['counts'].values())} label(s)")
+                print("output folder →", Path(pdf).parent / Path(pdf).stem)
+            return
+        print(f"[!] no detection server at {args.server}; loading the model here", file=sys.stderr)
+
+    from cpubackend import load_detector   # heavy (torch + weights): only the detecting process loads it
+    run_pipeline(pdf_paths, load_detector(args.backend), page_spec, args.batch, args.render_workers, args.post_workers,
+                 mask_mode=args.mask, zoom=args.dpi / 72, tile_px=args.tile, overlap=args.overlap,
+                 use_cache=not args.no_cache, refresh=args.refresh)
 
 
 if __name__ == "__main__":
-    pdf_path = Path(input("PDF Path: ").strip().strip('"'))
-    if not pdf_path.exists():
-        sys.exit("PDF not found.")
-
-    out_dir = pdf_path.parent / pdf_path.stem
-    jpg_path = pdf_to_jpg(pdf_path, out_dir)
-
-
-    yolo = YOLO(); crop=True; count=False
-    r_img, coord_raw = yolo.detect_image(Image.open(jpg_path), crop=crop, count=count)
-    if coord_raw is None or len(coord_raw)!=4:
-        sys.exit("No detection.")
-    coord_px = (coord_raw[1], coord_raw[0], coord_raw[3], coord_raw[2])  # yx→xy
-
-
-    annotated_path = out_dir / f"{pdf_path.stem}_annotated.png"
-    r_img.save(annotated_path, quality=95, subsampling=0)
-    print("Coordinate", coord_px)
-
-
-    try:
-        pdf_postprocess(pdf_path, annotated_path, coord_px, out_dir)
-    except Exception as e:
-        print("Post-processing failed:", e)
->>>>>>> dc417a4d1236f18ca80811912643da3b84695192
+    cli()
@@ -1,35 +1,62 @@
-import fitz  
+import fitz
 from PIL import Image, ImageDraw
+import argparse
 import os
+import sys
+from pathlib import Path
 
-def visualize_text_boxes(pdf_path, output_folder="P1"):
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from tagmatch import count_matrix, resolve_tags
+from wordtable import WordTable
+
+DEFAULT_TAGS = ["p1"]
+
+
+def visualize_text_boxes(pdf_path, output_folder="P1", tags=None):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
+    tags = tags or resolve_tags(default=DEFAULT_TAGS)
     doc = fitz.open(pdf_path)
-    
+    per_page = {}
+
     for page_number in range(len(doc)):
         page = doc[page_number]
-        
+
         # 渲染页面为图像
         pix = page.get_pixmap()
         mode = "RGB" if pix.alpha == 0 else "RGBA"
         img = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
         draw = ImageDraw.Draw(img)
-        
-        # 提取页面中所有单词，每个单词的元组格式为 (x0, y0, x1, y1, text, ...)
-        words = page.get_text("words")
-        for word in words:
-            x0, y0, x1, y1 = word[:4]
-            text = word[4] if len(word) >= 5 else ""
-            # 仅标记文本为 "P1" 的区域，忽略大小写
-            if text.lower() == "p1":
-                draw.rectangle((x0, y0, x1, y1), outline="red", width=2)
-        
+
+        # 提取页面中所有单词（列式存储：坐标、文本编码、块/行/词编号）
+        # 一次匹配所有标签（精确 / 前缀 / 正则），忽略大小写
+        words = WordTable.from_page(page)
+        tag_idx = tags.assign(words)
+        hits = tag_idx >= 0
+        for x0, y0, x1, y1 in words.coords[hits].tolist():
+            draw.rectangle((x0, y0, x1, y1), outline="red", width=2)
+        per_page[page_number] = np.bincount(tag_idx[hits], minlength=len(tags))
+
         output_path = os.path.join(output_folder, f"page_{page_number+1}.png")
         img.save(output_path)
         print(f"Saved: {output_path}")
 
+    # 标签 × 页面 计数矩阵
+    table = count_matrix(tags, per_page)
+    table_path = os.path.join(output_folder, "tag_counts.xlsx")
+    table.to_excel(table_path, index=False)
+    print(f"Saved: {table_path}")
+    return table
+
 if __name__ == "__main__":
-    pdf_file = "output.pdf"  
-    visualize_text_boxes(pdf_file)
+    parser = argparse.ArgumentParser(description="Mark and count tags on every page in a single pass.")
+    parser.add_argument("pdf", nargs="?", default="output.pdf", help="PDF path (default: output.pdf)")
+    parser.add_argument("-t", "--tags", nargs="+",
+                        help="Tags: exact (P1), prefix (P*) or regex (re:^P\\d+$); default p1")
+    parser.add_argument("-s", "--schedule", help="Schedule file with the tags (.txt/.csv/.xlsx)")
+    parser.add_argument("-o", "--output", default="P1", help="Output folder (default: P1)")
+    args = parser.parse_args()
+    visualize_text_boxes(args.pdf, args.output, resolve_tags(args.tags, args.schedule, DEFAULT_TAGS))
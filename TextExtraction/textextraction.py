@@ -1,6 +1,11 @@
 import fitz  
 from PIL import Image, ImageDraw
 import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+from wordtable import WordTable
 
 def visualize_text_boxes(pdf_path, output_folder="Output"):
 
@@ -18,9 +23,8 @@ def visualize_text_boxes(pdf_path, output_folder="Output"):
         draw = ImageDraw.Draw(img)
         
 
-        words = page.get_text("words")
-        for word in words:
-            x0, y0, x1, y1 = word[:4]
+        words = WordTable.from_page(page)
+        for x0, y0, x1, y1 in words.coords.tolist():
 
             draw.rectangle((x0, y0, x1, y1), outline="red", width=2)
         
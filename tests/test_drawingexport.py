@@ -0,0 +1,119 @@
+"""
+Behaviour checks for Common/drawingexport.py.
+
+Usage:
+    python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import re
+import sys
+from pathlib import Path
+
+import fitz
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "Common"))
+
+from drawingexport import collect_groups, read_bin, write_bin, write_svg  # noqa: E402
+
+
+def _page():
+    doc = fitz.open()
+    return doc, doc.new_page(width=300, height=300)
+
+
+def _svg(page, tmp_path) -> str:
+    out = tmp_path / "v.svg"
+    write_svg(collect_groups(page), page.rect, out)
+    return out.read_text(encoding="utf-8")
+
+
+def _paths(svg: str):
+    return re.findall(r'<path d="([^"]*)"/>', svg)
+
+
+def test_rect_is_closed(tmp_path):
+    doc, page = _page()
+    page.draw_rect(fitz.Rect(10, 20, 110, 70), color=(1, 0, 0))
+    assert _paths(_svg(page, tmp_path)) == ["M10 20L110 20 110 70 10 70Z"]
+
+
+def test_quad_corners_go_round(tmp_path):
+    doc, page = _page()
+    page.draw_quad(fitz.Quad((100, 100), (200, 120), (90, 200), (190, 220)), color=(0, 0, 0))
+    assert _paths(_svg(page, tmp_path)) == ["M100 100L200 120 190 220 90 200Z"]
+
+
+class _Drawings:
+    """Page stand-in serving fixed ``get_cdrawings`` output (MuPDF spells out
+    most ``h`` operators as a final line, so ``closePath`` is rarely set)."""
+
+    rotation = 0
+    rect = fitz.Rect(0, 0, 300, 300)
+
+    def __init__(self, drawings):
+        self.drawings = drawings
+
+    def get_cdrawings(self):
+        return self.drawings
+
+
+def test_curve_and_close_path(tmp_path):
+    doc, page = _page()
+    shape = page.new_shape()
+    shape.draw_bezier((10, 10), (20, 0), (30, 20), (40, 10))
+    shape.draw_line((40, 10), (10, 40))
+    shape.finish(color=(0, 0, 1), closePath=False)
+    shape.commit()
+    assert _paths(_svg(page, tmp_path)) == ["M10 10C20 0 30 20 40 10L10 40"]
+
+    page = _Drawings([{"items": [("c", (10.0, 10.0), (20.0, 0.0), (30.0, 20.0), (40.0, 10.0)),
+                                 ("l", (40.0, 10.0), (10.0, 40.0))],
+                       "closePath": True, "type": "s", "color": (0.0, 0.0, 1.0), "width": 1.0}])
+    assert _paths(_svg(page, tmp_path)) == ["M10 10C20 0 30 20 40 10L10 40Z"]
+
+
+def test_zero_opacity_paint_is_dropped(tmp_path):
+    doc, page = _page()
+    page.draw_rect(fitz.Rect(10, 10, 50, 50), color=(1, 0, 0), fill=(0, 1, 0), fill_opacity=0)
+    page.draw_rect(fitz.Rect(60, 60, 90, 90), color=(1, 0, 0), fill=(0, 0, 1),
+                   stroke_opacity=0, fill_opacity=0)
+    groups = collect_groups(page)
+    assert len(groups) == 1
+    assert groups[0].style.fill is None and groups[0].drawings == 1
+    assert "fill-opacity" not in _svg(page, tmp_path)
+
+
+def test_strokes_are_merged(tmp_path):
+    doc, page = _page()
+    page.draw_line((0, 0), (10, 10), color=(0, 0, 0))
+    page.draw_line((20, 0), (30, 10), color=(0, 0, 0))
+    assert _paths(_svg(page, tmp_path)) == ["M0 0L10 10M20 0L30 10"]
+
+
+def test_fills_keep_their_own_path(tmp_path):
+    # two overlapping squares of opposite winding: merged into one non-zero
+    # path the overlap would become a hole
+    doc, page = _page()
+    shape = page.new_shape()
+    shape.draw_polyline([(0, 0), (20, 0), (20, 20), (0, 20)])
+    shape.finish(fill=(0, 0, 0), color=None, closePath=True)
+    shape.draw_polyline([(10, 10), (10, 30), (30, 30), (30, 10)])
+    shape.finish(fill=(0, 0, 0), color=None, closePath=True)
+    shape.commit()
+    svg = _svg(page, tmp_path)
+    assert svg.count("<g ") == 1
+    assert len(_paths(svg)) == 2
+
+
+def test_bin_round_trip(tmp_path):
+    doc, page = _page()
+    page.draw_rect(fitz.Rect(10, 20, 110, 70), color=(1, 0, 0))
+    page.draw_line((0, 0), (10, 10), color=(0, 0, 0), width=2)
+    groups = collect_groups(page, quantum=0.5)
+    write_bin(groups, page.rect, tmp_path / "v.bin", quantum=0.5)
+    size, back = read_bin(tmp_path / "v.bin")
+    assert size == (300, 300)
+    assert [g.style for g in back] == [g.style for g in groups]
+    assert [bytes(g.ops) for g in back] == [bytes(g.ops) for g in groups]
+    assert [list(g.coords) for g in back] == [list(g.coords) for g in groups]